@@ -1,10 +1,12 @@
 from flask import Flask
-import os
 import datetime
 import json
 from bson.objectid import ObjectId
 from dotenv import load_dotenv
 from app.controllers.detectionHistory import blueprint
+from app.controllers import analytics  # registers /api/dl/analytics
+from app.controllers import outbreaks  # registers /api/dl/outbreaks
+from app.controllers import history  # registers /api/dl/history
 load_dotenv()
 from flask_cors import CORS, cross_origin
 
@@ -23,14 +25,27 @@ def create_app():
     app = Flask(__name__)
     app.register_blueprint(blueprint)
     app.json_encoder = JSONEncoder
-    # Add database name to MONGO_URI
-    mongo_uri = os.getenv("MONGO_URI", "mongodb://mongodb:27017")
-    if "/fasal" not in mongo_uri and "?" not in mongo_uri:
-        mongo_uri = mongo_uri.rstrip("/") + "/fasal"
-    app.config["MONGO_URI"] = mongo_uri
+    from app import config
+    app.config["MONGO_URI"] = config.MONGO_URI
     app.config['CORS_RESOURCES'] = {r"*": {"origins": "http://localhost:3000"}}
     from app.db_config import mongo
+    from app.uploads import configure_uploads
+    from app.indexes import start_ensure_indexes
     CORS(app, supports_credentials=True)
-    mongo.init_app(app)
+    configure_uploads(app)
+    # Connect lazily, the app may be preloaded in the gunicorn master and
+    # MongoClient connections must not be shared with forked workers
+    mongo.init_app(app, connect=False)
+
+    from app.controllers import model_service, executor
+    if config.SHARED_WEIGHTS:
+        # Preloaded in the gunicorn master: load now so workers inherit the weights,
+        # thread setup and warm-up run in each worker after the fork (see gunicorn.conf.py)
+        model_service.load()
+    else:
+        executor.configure_threads()
+        model_service.start()
+        if config.ENSURE_INDEXES:
+            start_ensure_indexes(lambda: mongo.db)
     return app
 
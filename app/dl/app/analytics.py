@@ -0,0 +1,70 @@
+"""
+Pre-aggregated detection counts for the analytics dashboards
+Every detectionHistory document written adds one to an hourly and a daily
+rollup document per (class, state, district). The counts are applied as a
+single unordered bulk of $inc upserts per flushed history batch, so
+dashboards read a few hundred rollup documents instead of aggregating the
+raw history. tools/rebuild_rollups.py recomputes them from the history.
+"""
+from collections import Counter
+
+from pymongo import UpdateOne
+
+# Granularity -> (collection, length of the createdAt prefix that names the bucket).
+# createdAt is str(datetime), so "2026-10-18 13" is an hour and "2026-10-18" a day.
+ROLLUPS = {
+    'hour': ('detectionRollupHourly', 13),
+    'day': ('detectionRollupDaily', 10),
+}
+
+GROUP_FIELDS = ('bucket', 'detected_class', 'plant', 'state', 'district')
+
+
+def rollup_key(doc, prefix_length):
+    detected_class = doc.get('detected_class') or 'unknown'
+    return (doc['createdAt'][:prefix_length], detected_class, detected_class.split('___')[0],
+            doc.get('state') or 'unknown', doc.get('district') or 'unknown')
+
+
+def rollup_updates(docs, prefix_length):
+    """One $inc upsert per distinct (bucket, class, plant, state, district) in `docs`"""
+    counts = Counter(rollup_key(doc, prefix_length) for doc in docs if doc.get('createdAt'))
+    updates = []
+    for key, count in counts.items():
+        fields = dict(zip(GROUP_FIELDS, key))
+        updates.append(UpdateOne({'_id': '|'.join(key)},
+                                 {'$inc': {'count': count}, '$setOnInsert': fields},
+                                 upsert=True))
+    return updates
+
+
+def apply_rollups(db, docs):
+    """Count newly inserted history documents into every rollup collection"""
+    for collection, prefix_length in ROLLUPS.values():
+        updates = rollup_updates(docs, prefix_length)
+        if updates:
+            db[collection].bulk_write(updates, ordered=False)
+
+
+def query_rollups(db, granularity='day', start=None, end=None, filters=None, group_by=('bucket',), limit=1000):
+    """
+    Detection counts from the rollups between `start` and `end` (createdAt
+    prefixes, end inclusive), matching `filters` on the group fields and
+    summed per distinct combination of the `group_by` fields
+    """
+    collection, prefix_length = ROLLUPS[granularity]
+    match = {field: value for field, value in (filters or {}).items() if value}
+    if start or end:
+        match['bucket'] = {}
+        if start:
+            match['bucket']['$gte'] = start[:prefix_length]
+        if end:
+            # A day-long end covers each of its hourly buckets, "2026-10-18 05" < "2026-10-18~"
+            match['bucket']['$lt'] = end[:prefix_length] + '~'
+    pipeline = [
+        {'$match': match},
+        {'$group': {'_id': {field: f'${field}' for field in group_by}, 'count': {'$sum': '$count'}}},
+        {'$sort': {'_id.bucket': 1} if 'bucket' in group_by else {'count': -1}},
+        {'$limit': limit},
+    ]
+    return [dict(row['_id'], count=row['count']) for row in db[collection].aggregate(pipeline)]
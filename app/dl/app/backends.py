@@ -0,0 +1,212 @@
+"""
+Inference backends behind ResNet
+Each backend owns a loaded model and turns a preprocessed N x 3 x 256 x 256
+batch into float32 logits
+"""
+import json
+import torch
+
+# Supported inference precisions, "float64" being the legacy mode
+PRECISIONS = {
+    'float64': torch.float64,
+    'float32': torch.float32,
+    'bfloat16': torch.bfloat16,
+}
+
+
+def cpu_supports_bfloat16():
+    """Only use bfloat16 on CPUs with native bf16 instructions, it is emulated (and slow) elsewhere"""
+    try:
+        with open('/proc/cpuinfo') as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return 'avx512_bf16' in flags or 'amx_bf16' in flags
+
+
+def resolve_precision(precision):
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}', expected one of {list(PRECISIONS)}")
+    if precision == 'bfloat16' and not cpu_supports_bfloat16():
+        print("[RESNET] bfloat16 is not supported natively on this CPU, falling back to float32")
+        return 'float32'
+    return precision
+
+
+# Supported model artifacts:
+#   "state_dict"  - plant-disease-model.pth, built into ResNet9 in Python
+#   "torchscript" - frozen TorchScript module written by tools/export_torchscript.py
+#   "int8"        - quantized TorchScript module written by tools/quantize.py
+MODEL_FORMATS = ('state_dict', 'torchscript', 'int8')
+
+
+def quantized_engine():
+    """Prefer fbgemm (x86), fall back to qnnpack (ARM)"""
+    engines = torch.backends.quantized.supported_engines
+    return 'fbgemm' if 'fbgemm' in engines else 'qnnpack'
+
+
+def load_torchscript(path):
+    """Load a TorchScript artifact along with the metadata saved next to it"""
+    extra_files = {'meta.json': ''}
+    model = torch.jit.load(path, map_location=torch.device('cpu'), _extra_files=extra_files)
+    meta = json.loads(extra_files['meta.json'] or '{}')
+    return model, meta
+
+
+def optimize_loaded(module, precision):
+    """
+    optimize_for_inference (torch 1.10+) on a loaded frozen module. Its MKLDNN
+    prepacked weights don't survive torch.jit.save, so it runs after loading.
+    """
+    if not hasattr(torch.jit, 'optimize_for_inference') or precision != 'float32':
+        # MKLDNN kernels are float32 only
+        return module
+    try:
+        return torch.jit.optimize_for_inference(module)
+    except RuntimeError as ex:
+        print(f"[BACKEND] optimize_for_inference failed, serving the frozen module as is: {ex}")
+        return module
+
+
+def save_torchscript(module, path, meta):
+    """Save a TorchScript module with its metadata, see load_torchscript"""
+    torch.jit.save(module, path, _extra_files={'meta.json': json.dumps(meta)})
+
+
+class InferenceBackend:
+    """Interface shared by all backends"""
+    name = None
+    # Input dtype the model expects, one of PRECISIONS
+    precision = 'float32'
+
+    @property
+    def dtype(self):
+        return PRECISIONS[self.precision]
+
+    def predict_logits(self, xb):
+        raise NotImplementedError
+
+
+class TorchBackend(InferenceBackend):
+    """Eager or TorchScript PyTorch model"""
+    name = 'torch'
+
+    def __init__(self, model_path, model_format='state_dict', precision='float64', shared_memory=False):
+        if model_format not in MODEL_FORMATS:
+            raise ValueError(f"Unknown model format '{model_format}', expected one of {list(MODEL_FORMATS)}")
+        self.model_format = model_format
+        if model_format in ('torchscript', 'int8'):
+            if model_format == 'int8':
+                torch.backends.quantized.engine = quantized_engine()
+            # The artifact was traced for a fixed input dtype, which is stored in its metadata
+            self.model, meta = load_torchscript(model_path)
+            self.precision = meta.get('precision', 'float32')
+            if model_format == 'torchscript':
+                self.model = optimize_loaded(self.model, self.precision)
+        else:
+            from app.resnet9 import load_resnet9
+            self.precision = resolve_precision(precision)
+            self.model = load_resnet9(model_path)
+            self.model.to(PRECISIONS[self.precision])
+        self.model.eval()
+        if shared_memory:
+            self.share_weights()
+
+    def share_weights(self):
+        """
+        Move parameters and buffers into shared memory so processes forked
+        afterwards map the same physical pages instead of copying them on write.
+        Frozen TorchScript modules keep their weights as constants, which can't be shared.
+        """
+        self.model.share_memory()
+        tensors = list(self.model.parameters()) + list(self.model.buffers())
+        shared = sum(t.numel() * t.element_size() for t in tensors if t.is_shared())
+        print(f"[BACKEND] {shared / 1e6:.1f}MB of model weights in shared memory")
+
+    def predict_logits(self, xb):
+        with torch.no_grad():
+            yb = self.model(xb.to(self.dtype))
+        return yb.float()
+
+
+class CascadeBackend(TorchBackend):
+    """
+    Two-stage cascade over an eager ResNet9: an early-exit head on the res1
+    features answers when its top softmax probability reaches `threshold`,
+    only the remaining images continue through the 256/512 channel stage.
+    The head is trained with tools/train_early_exit.py.
+    """
+    name = 'cascade'
+
+    def __init__(self, model_path, head_path, threshold=0.9, precision='float64', shared_memory=False):
+        super().__init__(model_path, model_format='state_dict', precision=precision, shared_memory=shared_memory)
+        from app.resnet9 import EarlyExitHead
+        self.threshold = threshold
+        self.head = EarlyExitHead(self.model.widths[1], self.model.classifier[-1].out_features)
+        self.head.load_state_dict(torch.load(head_path, map_location=torch.device('cpu')))
+        self.head.to(self.dtype)
+        self.head.eval()
+        self.early_exits = 0
+        self.total = 0
+
+    def predict_logits(self, xb):
+        with torch.no_grad():
+            features = self.model.forward_stage1(xb.to(self.dtype))
+            logits = self.head(features).float()
+            confident = torch.softmax(logits, dim=1).max(dim=1).values >= self.threshold
+            rest = ~confident
+            if rest.any():
+                logits[rest] = self.model.forward_stage2(features[rest]).float()
+        # Counters are approximate under concurrent calls, good enough for monitoring
+        self.early_exits += int(confident.sum())
+        self.total += len(xb)
+        return logits
+
+    def stats(self):
+        return {
+            'threshold': self.threshold,
+            'images': self.total,
+            'earlyExits': self.early_exits,
+            'earlyExitRate': self.early_exits / self.total if self.total else 0.0,
+        }
+
+
+class OnnxBackend(InferenceBackend):
+    """ONNX Runtime CPU session over a model written by tools/export_onnx.py"""
+    name = 'onnx'
+
+    ONNX_PRECISIONS = {'tensor(float)': 'float32', 'tensor(double)': 'float64'}
+
+    def __init__(self, model_path, threads=0):
+        # Optional dependency (requirements-onnx.txt), only needed when this backend is selected
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.precision = self.ONNX_PRECISIONS.get(model_input.type, 'float32')
+
+    def predict_logits(self, xb):
+        yb = self.session.run(None, {self.input_name: xb.to(self.dtype).numpy()})[0]
+        return torch.from_numpy(yb).float()
+
+
+BACKENDS = ('torch', 'onnx')
+
+
+def create_backend(name, model_path, model_format='state_dict', precision='float64', onnx_threads=0,
+                   shared_memory=False, cascade_head_path=None, cascade_threshold=0.9):
+    if name == 'torch' and cascade_head_path:
+        if model_format != 'state_dict':
+            raise ValueError("The cascade needs the eager model, use DL_MODEL_FORMAT=state_dict")
+        return CascadeBackend(model_path, cascade_head_path, threshold=cascade_threshold, precision=precision,
+                              shared_memory=shared_memory)
+    if name == 'torch':
+        return TorchBackend(model_path, model_format=model_format, precision=precision, shared_memory=shared_memory)
+    if name == 'onnx':
+        return OnnxBackend(model_path, threads=onnx_threads)
+    raise ValueError(f"Unknown backend '{name}', expected one of {list(BACKENDS)}")
@@ -0,0 +1,97 @@
+"""
+Micro-batching scheduler for the shared ResNet instance
+Concurrent requests are collected for a short window and run as a single forward pass
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+
+
+class MicroBatcher:
+    """
+    Collects preprocessed images from request threads and runs them through
+    the model in batches of up to `max_batch_size`, waiting at most
+    `max_wait_ms` after the first image arrives before dispatching.
+    """
+
+    def __init__(self, resnet, max_batch_size=8, max_wait_ms=5.0):
+        self.resnet = resnet
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    @property
+    def enabled(self):
+        return self.max_batch_size > 1
+
+    def stats(self):
+        return {
+            'maxBatchSize': self.max_batch_size,
+            'maxWaitMs': self.max_wait * 1000,
+            'queueDepth': self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0,
+        }
+
+    def predict(self, image, timeout=None):
+        """
+        Decode `image` in the calling thread and wait for its batched prediction,
+        a dict with the class `label` and per-class `probabilities`
+        """
+        tensor = self.resnet.preprocess(image)
+        if not self.enabled:
+            return self.resnet.predict_results(tensor.unsqueeze(0))[0]
+        return self.submit(tensor).result(timeout)
+
+    def submit(self, tensor):
+        """Queue a single preprocessed image (C x H x W) and return a Future for its result"""
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((tensor, future))
+        return future
+
+    def _ensure_worker(self):
+        # The worker thread is started lazily, and restarted in forked
+        # children where the parent's thread no longer exists.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, name='dl-micro-batcher', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(items) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._dispatch(items)
+
+    def _dispatch(self, items):
+        items = [(tensor, future) for tensor, future in items if future.set_running_or_notify_cancel()]
+        if not items:
+            return
+        try:
+            xb = torch.stack([tensor for tensor, _ in items])
+            results = self.resnet.predict_results(xb)
+        except Exception as ex:
+            for _, future in items:
+                future.set_exception(ex)
+            return
+        for (_, future), result in zip(items, results):
+            future.set_result(result)
@@ -0,0 +1,198 @@
+"""
+In-process cache of the plant and disease catalog
+Both collections are tiny and almost static, so they are loaded whole and
+indexed by class label (disease.name) and common name (plants.commonName).
+A snapshot is reloaded when it is older than the TTL, or sooner when the
+version stamp in catalogMeta changes (bump_catalog_version, called by
+seed-database.py and anything else that edits the catalog).
+Free-text disease names are matched in memory against normalized keys of
+every label, its disease part and its `aliases`, never with a Mongo $regex.
+With the cache disabled the text is matched against the model's class labels
+instead and only the resulting label is fetched, by the unique name index.
+"""
+import bisect
+import difflib
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from pymongo.errors import PyMongoError
+
+VERSION_COLLECTION = 'catalogMeta'
+VERSION_ID = 'catalog'
+
+
+def normalize_name(text):
+    """Lookup key for a disease name: lowercase words, any run of spaces, underscores or punctuation as one space"""
+    return ' '.join(re.findall(r'[0-9a-z]+', text.lower()))
+
+
+def read_class_labels(path=None):
+    """Class labels of the model, in output order"""
+    with open(path or os.path.join(os.getcwd(), 'app', 'classes.txt')) as f:
+        return f.read().split(',')
+
+
+def bump_catalog_version(db):
+    """Mark the catalog as changed, running services reload it within their check interval"""
+    db[VERSION_COLLECTION].update_one({'_id': VERSION_ID},
+                                      {'$inc': {'version': 1}, '$set': {'updatedAt': datetime.now()}},
+                                      upsert=True)
+
+
+class DiseaseNames:
+    """Disease documents indexed by the normalized keys of their label, disease part and aliases"""
+
+    def __init__(self, diseases):
+        self.keys = {}
+        for doc in diseases:
+            name = doc['name']
+            keys = [name, *doc.get('aliases', [])]
+            if '___' in name:
+                keys.append(name.split('___', 1)[1])
+            for key in map(normalize_name, keys):
+                # Full labels first, so "early blight" alone goes to whichever plant was seen first
+                self.keys.setdefault(key, doc)
+        self.sorted_keys = sorted(self.keys)
+
+    def match(self, text, plant=None, cutoff=0.8):
+        """
+        Document for a free-text name, trying the normalized key (qualified by
+        `plant` when given), then the shortest key starting with it, then the
+        closest key by edit similarity
+        """
+        key = normalize_name(text)
+        if not key:
+            return None
+        candidates = [normalize_name(f'{plant} {text}'), key] if plant else [key]
+        for candidate in candidates:
+            if candidate in self.keys:
+                return self.keys[candidate]
+        for candidate in candidates:
+            start = bisect.bisect_left(self.sorted_keys, candidate)
+            matches = [k for k in self.sorted_keys[start:start + 50] if k.startswith(candidate)]
+            if matches:
+                return self.keys[min(matches, key=len)]
+        for candidate in candidates:
+            close = difflib.get_close_matches(candidate, self.sorted_keys, n=1, cutoff=cutoff)
+            if close:
+                return self.keys[close[0]]
+        return None
+
+
+class CatalogSnapshot:
+    """Plants and diseases indexed for lookups, only checked_at changes once built"""
+
+    def __init__(self, plants, diseases, version):
+        self.plants = {doc['commonName']: doc for doc in plants if 'commonName' in doc}
+        self.diseases = {doc['name']: doc for doc in diseases if 'name' in doc}
+        self.disease_names = DiseaseNames(self.diseases.values())
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.checked_at = self.loaded_at
+
+
+class CatalogCache:
+    """
+    Serves plant and disease documents from memory. `db` is a callable
+    returning the Mongo database, so the cache can be created before the app.
+    Documents are shared between requests and must be treated as read-only.
+    A ttl of 0 disables the cache and every lookup queries Mongo; free-text
+    names are then resolved against `labels` (the model's class labels) and
+    only the matching label is fetched.
+    """
+
+    def __init__(self, db, ttl_seconds=600.0, check_seconds=10.0, labels=()):
+        self.db = db
+        self.ttl = ttl_seconds
+        self.check_interval = check_seconds
+        self.label_names = DiseaseNames({'name': label} for label in labels)
+        self._snapshot = None
+        self._refresh_lock = threading.Lock()
+        self.reloads = 0
+        self.refresh_errors = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def plant(self, common_name):
+        if not self.enabled:
+            return self.db().plants.find_one({'commonName': common_name})
+        return self._current().plants.get(common_name)
+
+    def disease(self, name):
+        if not self.enabled:
+            return self.db().disease.find_one({'name': name})
+        return self._current().diseases.get(name)
+
+    def lookup(self, detection):
+        """(plant, disease) documents for a class label such as Tomato___Early_blight, None when missing"""
+        return self.plant(detection.split('___')[0]), self.disease(detection)
+
+    def find_disease(self, text, plant=None, cutoff=0.8):
+        """Disease document for a free-text name such as "Tomato Yellow Leaf Curl Virus", see DiseaseNames.match"""
+        if self.enabled:
+            return self._current().disease_names.match(text, plant, cutoff)
+        # Never load the whole collection per request: resolve the label, then one indexed lookup
+        label = self.label_names.match(text, plant, cutoff)
+        return self.disease(label['name']) if label else None
+
+    def invalidate(self):
+        """Drop the snapshot, the next lookup reloads it"""
+        self._snapshot = None
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'enabled': self.enabled,
+            'plants': len(snapshot.plants) if snapshot else 0,
+            'diseases': len(snapshot.diseases) if snapshot else 0,
+            'version': snapshot.version if snapshot else None,
+            'ageSeconds': round(time.monotonic() - snapshot.loaded_at, 1) if snapshot else None,
+            'reloads': self.reloads,
+            'refreshErrors': self.refresh_errors,
+        }
+
+    def _current(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Nothing to serve yet, every caller waits for the first load
+            with self._refresh_lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load()
+                return self._snapshot
+        now = time.monotonic()
+        if now - snapshot.checked_at >= min(self.check_interval, self.ttl):
+            # One request refreshes, the others keep using the current snapshot
+            if self._refresh_lock.acquire(blocking=False):
+                try:
+                    self._refresh(snapshot, now)
+                finally:
+                    self._refresh_lock.release()
+        return self._snapshot
+
+    def _refresh(self, snapshot, now):
+        try:
+            if now - snapshot.loaded_at >= self.ttl or self._version() != snapshot.version:
+                self._snapshot = self._load()
+            else:
+                snapshot.checked_at = now
+        except PyMongoError as ex:
+            # Serve the stale catalog rather than failing detections, retry at the next check
+            self.refresh_errors += 1
+            snapshot.checked_at = now
+            print(f"Catalog refresh failed, keeping version {snapshot.version}: {ex}")
+
+    def _version(self):
+        doc = self.db()[VERSION_COLLECTION].find_one({'_id': VERSION_ID})
+        return doc.get('version') if doc else None
+
+    def _load(self):
+        db = self.db()
+        version = self._version()
+        snapshot = CatalogSnapshot(list(db.plants.find()), list(db.disease.find()), version)
+        self.reloads += 1
+        return snapshot
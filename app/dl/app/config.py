@@ -0,0 +1,127 @@
+"""
+Runtime configuration for the detection service
+All values are read from the environment (or a .env file) once at import time
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, '') else default
+
+
+def env_float(name, default):
+    value = os.getenv(name)
+    return float(value) if value not in (None, '') else default
+
+
+# MongoDB connection, the fasal database is appended when the URI names none
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongodb:27017")
+if "/fasal" not in MONGO_URI and "?" not in MONGO_URI:
+    MONGO_URI = MONGO_URI.rstrip("/") + "/fasal"
+
+# Micro-batching in front of the shared ResNet instance.
+# A max batch size of 1 disables the queue and runs every request directly.
+BATCH_MAX_SIZE = env_int('DL_BATCH_MAX_SIZE', 8)
+BATCH_MAX_WAIT_MS = env_float('DL_BATCH_MAX_WAIT_MS', 5.0)
+
+# Inference precision: "float64" (legacy), "float32" or "bfloat16".
+# bfloat16 falls back to float32 on CPUs without native bf16 support.
+PRECISION = os.getenv('DL_PRECISION', 'float64')
+
+# Model artifact to serve: "state_dict" (plant-disease-model.pth), "torchscript"
+# (written by tools/export_torchscript.py) or "int8" (written by tools/quantize.py).
+# state_dict paths may also point at a pruned checkpoint written by tools/compress.py.
+MODEL_FORMAT = os.getenv('DL_MODEL_FORMAT', 'state_dict')
+MODEL_PATH = os.getenv('DL_MODEL_PATH') or os.path.join(os.getcwd(), 'app', 'ResNet', 'plant-disease-model.pth')
+
+# Inference backend: "torch" (any MODEL_FORMAT) or "onnx" (DL_MODEL_PATH points at
+# a model written by tools/export_onnx.py). 0 threads lets ONNX Runtime decide.
+BACKEND = os.getenv('DL_BACKEND', 'torch')
+ONNX_THREADS = env_int('DL_ONNX_THREADS', 0)
+
+# Prediction cache keyed by upload hash. Set DL_PREDICTION_CACHE_SIZE=0 to disable,
+# DL_PREDICTION_CACHE_MONGO=0 to keep it in memory only.
+PREDICTION_CACHE_SIZE = env_int('DL_PREDICTION_CACHE_SIZE', 1024)
+PREDICTION_CACHE_MONGO = env_int('DL_PREDICTION_CACHE_MONGO', 1) == 1
+# Days a Mongo cache entry lives after it was stored, enforced by a TTL index
+PREDICTION_CACHE_TTL_DAYS = env_int('DL_PREDICTION_CACHE_TTL_DAYS', 30)
+
+# Upper bound on images accepted by /api/dl/detection/batch
+BATCH_ENDPOINT_MAX_IMAGES = env_int('DL_BATCH_ENDPOINT_MAX_IMAGES', 64)
+
+# Load the model once in the gunicorn master (preload_app) and keep its weights in
+# shared memory so every forked worker uses the same physical pages. See gunicorn.conf.py.
+SHARED_WEIGHTS = env_int('DL_SHARED_WEIGHTS', 0) == 1
+
+# Synthetic forward passes run per warm-up batch size before /api/dl/ready reports ready
+WARMUP_ITERATIONS = env_int('DL_WARMUP_ITERATIONS', 3)
+
+# Forward passes allowed to run at once across all request threads, and the
+# PyTorch thread pools behind them. 0 intra-op threads splits the available
+# cores evenly between the concurrent passes.
+INFERENCE_CONCURRENCY = env_int('DL_INFERENCE_CONCURRENCY', 1)
+INTRA_OP_THREADS = env_int('DL_INTRA_OP_THREADS', 0)
+INTER_OP_THREADS = env_int('DL_INTER_OP_THREADS', 1)
+
+# gunicorn worker processes and request threads per process (gunicorn.conf.py). The
+# intra-op default above divides the cores between every worker's concurrent passes.
+WORKERS = env_int('DL_WORKERS', 1)
+THREADS = env_int('DL_THREADS', 8)
+
+# Two-stage cascade (torch backend, state_dict format only): images whose
+# early-exit head confidence reaches the threshold skip the rest of ResNet9.
+# Empty head path disables it. Train the head with tools/train_early_exit.py.
+CASCADE_HEAD_PATH = os.getenv('DL_CASCADE_HEAD_PATH', '')
+CASCADE_THRESHOLD = env_float('DL_CASCADE_THRESHOLD', 0.9)
+
+# Upload limits. Each image is streamed into a temporary file kept in memory up to
+# DL_UPLOAD_SPOOL_BYTES and spooled to disk beyond it. Images over DL_MAX_UPLOAD_BYTES,
+# requests over DL_MAX_REQUEST_BYTES and images over DL_MAX_IMAGE_PIXELS (read from
+# the header) are rejected before decoding.
+MAX_UPLOAD_BYTES = env_int('DL_MAX_UPLOAD_BYTES', 10 * 1024 * 1024)
+MAX_REQUEST_BYTES = env_int('DL_MAX_REQUEST_BYTES', 64 * 1024 * 1024)
+UPLOAD_SPOOL_BYTES = env_int('DL_UPLOAD_SPOOL_BYTES', 512 * 1024)
+MAX_IMAGE_PIXELS = env_int('DL_MAX_IMAGE_PIXELS', 40_000_000)
+
+# Plant/disease catalog cache. The whole catalog is reloaded every DL_CATALOG_TTL_SECONDS,
+# or within DL_CATALOG_CHECK_SECONDS of its version stamp changing. A TTL of 0 disables it.
+CATALOG_TTL_SECONDS = env_float('DL_CATALOG_TTL_SECONDS', 600.0)
+CATALOG_CHECK_SECONDS = env_float('DL_CATALOG_CHECK_SECONDS', 10.0)
+
+# Write-behind buffer for detectionHistory. Documents are inserted in unordered batches of
+# DL_HISTORY_FLUSH_SIZE or after DL_HISTORY_FLUSH_MS. Anything Mongo can't take, or
+# beyond DL_HISTORY_MAX_PENDING in memory, is spilled to DL_HISTORY_SPILL_DIR and
+# replayed later. DL_HISTORY_WRITE_BEHIND=0 inserts synchronously instead.
+HISTORY_WRITE_BEHIND = env_int('DL_HISTORY_WRITE_BEHIND', 1) == 1
+HISTORY_FLUSH_SIZE = env_int('DL_HISTORY_FLUSH_SIZE', 100)
+HISTORY_FLUSH_MS = env_float('DL_HISTORY_FLUSH_MS', 1000.0)
+HISTORY_MAX_PENDING = env_int('DL_HISTORY_MAX_PENDING', 10000)
+HISTORY_SPILL_DIR = os.getenv('DL_HISTORY_SPILL_DIR') or os.path.join(os.getcwd(), 'spill')
+
+# Create the indexes in app/indexes.py in the background at startup
+ENSURE_INDEXES = env_int('DL_ENSURE_INDEXES', 1) == 1
+
+# Hourly and daily detection count rollups behind /api/dl/analytics, updated as
+# history batches are written
+ANALYTICS_ROLLUPS = env_int('DL_ANALYTICS_ROLLUPS', 1) == 1
+
+# /api/dl/outbreaks: largest radius accepted, and the heatmap tile layer's grid size,
+# time bucket (a tile is recomputed at most once per bucket) and cache size
+OUTBREAK_MAX_RADIUS_KM = env_float('DL_OUTBREAK_MAX_RADIUS_KM', 500.0)
+OUTBREAK_TILE_GRID = env_int('DL_OUTBREAK_TILE_GRID', 16)
+OUTBREAK_TILE_BUCKET_SECONDS = env_int('DL_OUTBREAK_TILE_BUCKET_SECONDS', 300)
+OUTBREAK_TILE_CACHE_SIZE = env_int('DL_OUTBREAK_TILE_CACHE_SIZE', 2048)
+
+# History tiers: records older than DL_HISTORY_ARCHIVE_DAYS are moved to the cold
+# collection by tools/archive_history.py, /api/dl/history reads both. An empty
+# collection name keeps history reads on the hot tier only.
+HISTORY_COLD_COLLECTION = os.getenv('DL_HISTORY_COLD_COLLECTION', 'detectionHistoryArchive')
+HISTORY_ARCHIVE_DAYS = env_int('DL_HISTORY_ARCHIVE_DAYS', 90)
+HISTORY_PAGE_MAX = env_int('DL_HISTORY_PAGE_MAX', 500)
+
+# Documents per Mongo batch for /api/dl/history/export and tools/export_history.py
+EXPORT_BATCH_SIZE = env_int('DL_EXPORT_BATCH_SIZE', 1000)
@@ -1,7 +1,15 @@
 from flask import Blueprint,jsonify,request
 from app.db_config import mongo
 from datetime import datetime
-from app.resnet import ResNet
+from app.model_service import ModelService
+from app.batcher import MicroBatcher
+from app.executor import InferenceExecutor
+from app.prediction_cache import PredictionCache
+from app.catalog import CatalogCache, read_class_labels
+from app.write_behind import WriteBehindBuffer
+from app.analytics import apply_rollups
+from app.geo import TileCache
+from app import config
 
 blueprint = Blueprint(
       'app_blueprint',
@@ -9,4 +17,39 @@ blueprint = Blueprint(
     url_prefix='',
 )
 
-resnet = ResNet()
+model_service = ModelService(
+    warmup_iterations=config.WARMUP_ITERATIONS,
+    warmup_batch_sizes=(1, config.BATCH_MAX_SIZE),
+)
+executor = InferenceExecutor(
+    model_service,
+    # More passes than request threads could never run at once
+    max_concurrency=min(config.INFERENCE_CONCURRENCY, config.THREADS),
+    intra_op_threads=config.INTRA_OP_THREADS,
+    inter_op_threads=config.INTER_OP_THREADS,
+    processes=config.WORKERS,
+)
+batcher = MicroBatcher(executor, max_batch_size=config.BATCH_MAX_SIZE, max_wait_ms=config.BATCH_MAX_WAIT_MS)
+prediction_cache = PredictionCache(
+    max_entries=config.PREDICTION_CACHE_SIZE,
+    collection=(lambda: mongo.db.predictionCache) if config.PREDICTION_CACHE_MONGO else None,
+)
+catalog = CatalogCache(
+    lambda: mongo.db,
+    ttl_seconds=config.CATALOG_TTL_SECONDS,
+    check_seconds=config.CATALOG_CHECK_SECONDS,
+    labels=read_class_labels(),
+)
+history_writer = WriteBehindBuffer(
+    lambda: mongo.db.detectionHistory,
+    flush_size=config.HISTORY_FLUSH_SIZE,
+    flush_ms=config.HISTORY_FLUSH_MS,
+    max_pending=config.HISTORY_MAX_PENDING,
+    spill_dir=config.HISTORY_SPILL_DIR,
+    enabled=config.HISTORY_WRITE_BEHIND,
+    on_insert=(lambda docs: apply_rollups(mongo.db, docs)) if config.ANALYTICS_ROLLUPS else None,
+)
+tile_cache = TileCache(
+    max_entries=config.OUTBREAK_TILE_CACHE_SIZE,
+    bucket_seconds=config.OUTBREAK_TILE_BUCKET_SECONDS,
+)
@@ -0,0 +1,44 @@
+import flask
+from flask_cors import cross_origin
+
+from app.analytics import ROLLUPS, query_rollups
+from app.controllers import blueprint, mongo, request
+
+# Query string parameter -> rollup field
+FILTER_PARAMS = {'class': 'detected_class', 'plant': 'plant', 'state': 'state', 'district': 'district'}
+GROUP_PARAMS = {'bucket': 'bucket', 'class': 'detected_class', 'plant': 'plant', 'state': 'state',
+                'district': 'district'}
+MAX_ROWS = 10000
+
+
+@blueprint.route('/api/dl/analytics', methods=['GET'])
+@cross_origin(supports_credentials=True)
+def analytics():
+    """
+    Detection counts from the rollups, e.g.
+    /api/dl/analytics?granularity=day&from=2026-10-01&to=2026-10-18&state=MH&groupBy=bucket,class
+    from/to are dates ("2026-10-18") or hours ("2026-10-18 13"), both inclusive
+    """
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ROLLUPS:
+        return flask.jsonify({'ok': False, 'message': f'granularity must be one of {", ".join(ROLLUPS)}'}), 400
+    group_params = [param for param in request.args.get('groupBy', 'bucket').split(',') if param]
+    unknown = [param for param in group_params if param not in GROUP_PARAMS]
+    if unknown or not group_params:
+        return flask.jsonify({'ok': False,
+                              'message': f'groupBy must be a comma-separated list of {", ".join(GROUP_PARAMS)}'}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 1000)), MAX_ROWS))
+    except ValueError:
+        return flask.jsonify({'ok': False, 'message': 'limit must be an integer'}), 400
+
+    filters = {field: request.args.get(param) for param, field in FILTER_PARAMS.items()}
+    group_by = tuple(GROUP_PARAMS[param] for param in group_params)
+    try:
+        rows = query_rollups(mongo.db, granularity, request.args.get('from'), request.args.get('to'),
+                             filters, group_by, limit)
+    except Exception as ex:
+        import traceback
+        traceback.print_exc()
+        return flask.jsonify({'ok': False, 'message': f'Error querying analytics: {ex}'}), 500
+    return flask.jsonify({'ok': True, 'granularity': granularity, 'groupBy': list(group_by), 'rows': rows})
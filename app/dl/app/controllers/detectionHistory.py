@@ -1,6 +1,13 @@
-from app.controllers import blueprint, mongo, jsonify, datetime, resnet, request
+from app.controllers import (blueprint, mongo, jsonify, datetime, model_service, executor, batcher, prediction_cache,
+                             catalog, history_writer, tile_cache, request)
 from bson.objectid import ObjectId
 import flask
+import torch
+from app import config
+from app.preprocessing import IMAGE_SIZE
+from app.uploads import check_image
+from app.geo import geo_point
+from werkzeug.exceptions import HTTPException
 from flask_cors import CORS, cross_origin
 from app.schemas import validate_detectionHistory
 
@@ -8,11 +15,75 @@ from app.schemas import validate_detectionHistory
 from app.live_scraper import scrape_plantix_details, search_products_online
 
 
+def predict_upload(image):
+    """Classify an uploaded image, skipping decode and inference for bytes seen before"""
+    check_image(image)
+    if not prediction_cache.enabled:
+        return batcher.predict(image)
+    key = prediction_cache.key_for(image, model_service.model_id)
+    result = prediction_cache.get(key)
+    if result is None:
+        result = batcher.predict(image)
+        prediction_cache.put(key, result)
+    return result
+
+
+def predict_uploads(images):
+    """Classify several uploads with a single forward pass over the ones not cached yet"""
+    for image in images:
+        check_image(image)
+    results = [None] * len(images)
+    keys = [None] * len(images)
+    pending = []
+    for i, image in enumerate(images):
+        if prediction_cache.enabled:
+            keys[i] = prediction_cache.key_for(image, model_service.model_id)
+            results[i] = prediction_cache.get(keys[i])
+        if results[i] is None:
+            pending.append(i)
+
+    if pending:
+        xb = torch.empty(len(pending), 3, IMAGE_SIZE, IMAGE_SIZE, dtype=executor.dtype)
+        for row, i in enumerate(pending):
+            executor.preprocess(images[i], out=xb[row])
+        for i, result in zip(pending, executor.predict_results(xb)):
+            results[i] = result
+            if keys[i] is not None:
+                prediction_cache.put(keys[i], result)
+    return results
+
+
+def upload_rejected(ex):
+    """JSON body for the 413/415 raised while reading or checking an upload"""
+    return flask.jsonify({'ok': False, 'message': ex.description}), ex.code
+
+
+def model_not_ready():
+    return flask.jsonify({'ok': False, 'message': 'Model is still loading, try again shortly',
+                          'model': model_service.status()}), 503
+
+
 @blueprint.route('/api/dl', methods=["GET"])
 def hello():
     return 'Hello, World!'
 
 
+@blueprint.route('/api/dl/ready', methods=["GET"])
+def ready():
+    """Readiness probe: 200 only once the model is loaded and warmed up"""
+    return jsonify({'ok': model_service.ready, 'model': model_service.status()}), 200 if model_service.ready else 503
+
+
+@blueprint.route('/api/dl/stats', methods=["GET"])
+def stats():
+    body = {'ok': True, 'predictionCache': prediction_cache.stats(),
+            'inference': executor.stats(), 'batcher': batcher.stats(), 'catalog': catalog.stats(),
+            'historyWriter': history_writer.stats(), 'tileCache': tile_cache.stats()}
+    if model_service.loaded and hasattr(model_service.resnet.backend, 'stats'):
+        body['backend'] = model_service.resnet.backend.stats()
+    return jsonify(body), 200
+
+
 @blueprint.route('/api/dl/prediction/test', methods=['GET'])
 def test1():
     print(ObjectId("623a3d74960a9f8526395e08"))
@@ -29,68 +100,86 @@ def test1():
     return jsonify({'ok': False, 'message': 'Bad request parameters: {}'.format(data['message'])}), 400
 
 
+def fallback_plant_info(plant):
+    """Stand-in plant document for plants missing from the database"""
+    return {
+        "_id": ObjectId('507f191e810c19729de860ea'),
+        "commonName": plant,
+        "scientificName": "Unknown",
+        "description": "Plant information not available in database"
+    }
+
+
+def fallback_disease_info(detection):
+    """Stand-in disease document for classes missing from the database"""
+    disease = detection.split('___')[1]
+    return {
+        "_id": ObjectId('507f191e810c19729de860eb'),
+        "name": detection,
+        "description": "Disease information not available in database" if disease != "healthy" else "Plant appears healthy"
+    }
+
+
+def build_detection_history(detection, plant_info, disease_info):
+    uid = '124352414'
+    city = 'Mumbai'
+    ip = '13143536'
+    district = 'Mumbai City'
+    state = 'MH'
+    lat = 11.4652
+    lon = 242.24
+
+    return {
+        "createdAt": str(datetime.now()),
+        "ip": ip,
+        "city": city,
+        "district": district,
+        "state": state,
+        "location": {
+            "lat": lat,
+            "lon": lon
+        },
+        "geo": geo_point(lat, lon),
+        "detected_class": detection,
+        "plantId": plant_info['_id'],
+        "diseaseId": disease_info['_id'],
+        "rating": 5
+    }
+
+
 @blueprint.route('/api/dl/detection', methods=['POST'])
 @cross_origin(supports_credentials=True)
 def dl_detection():
+    if not model_service.loaded:
+        return model_not_ready()
     try:
-        uid = '124352414'
-        city = 'Mumbai'
-        ip = '13143536'
-        district = 'Mumbai City'
-        state = 'MH'
-        lat = 11.4652
-        lon = 242.24
-
         # print(request.headers)
 
         image = request.files['image']
-        detection = resnet.predict_image(image)
+        detection = predict_upload(image)['label']
         print( detection)
-        detection_split = detection.split('___')
-        plant, disease = detection_split[0], detection_split[1]
-        disease_info = mongo.db.disease.find_one({"name": detection})
-        plant_info = mongo.db.plants.find_one({"commonName": plant})
+        plant = detection.split('___')[0]
+        plant_info, disease_info = catalog.lookup(detection)
         
         # Handle case when plant or disease not found in database
         if plant_info is None:
-            plant_info = {
-                "_id": ObjectId('507f191e810c19729de860ea'),
-                "commonName": plant,
-                "scientificName": "Unknown",
-                "description": "Plant information not available in database"
-            }
+            plant_info = fallback_plant_info(plant)
         
         if disease_info is None:
-            disease_info = {
-                "_id": ObjectId('507f191e810c19729de860eb'),
-                "name": detection,
-                "description": "Disease information not available in database" if disease != "healthy" else "Plant appears healthy"
-            }
+            disease_info = fallback_disease_info(detection)
         
-        detectionHistory = {
-            "createdAt": str(datetime.now()),
-            "ip": ip,
-            "city": city,
-            "district": district,
-            "state": state,
-            "location": {
-                "lat": lat,
-                "lon": lon
-            },
-            "detected_class": detection,
-            "plantId": plant_info['_id'],
-            "diseaseId": disease_info['_id'],
-            "rating": 5
-        }
+        detectionHistory = build_detection_history(detection, plant_info, disease_info)
 
         validated_detectionHistory = validate_detectionHistory(detectionHistory)
-        done = mongo.db.detectionHistory.insert_one(validated_detectionHistory['data'])
+        history_writer.add(validated_detectionHistory['data'])
         response = flask.jsonify({'ok': True, 'detection': detection,
                                 'validated_detectionHistory ': validated_detectionHistory, "plant": plant_info,
                                 "disease": disease_info})
         # response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
         return response
     #     return jsonify({'ok': True, 'detection': detection,'validated_detectionHistory ':validated_detectionHistory,"plant":plant_info,"disease":"No disease found" if disease_info==None else disease_info}), 200
+    except HTTPException as ex:
+        return upload_rejected(ex)
     except Exception as ex:
         import traceback
         traceback.print_exc()
@@ -106,6 +195,51 @@ def dl_detection():
     #     return jsonify({'ok': True, 'message': 'User created successfully!','detectionHistory':data}), 200
 
 
+@blueprint.route('/api/dl/detection/batch', methods=['POST'])
+@cross_origin(supports_credentials=True)
+def dl_detection_batch():
+    """
+    Detect diseases on many images at once (multipart field "images").
+    Runs one forward pass, resolves every label from the in-memory catalog cache and
+    hands all history documents to the write-behind buffer in one add_many call.
+    """
+    if not model_service.loaded:
+        return model_not_ready()
+    try:
+        images = request.files.getlist('images')
+        if not images:
+            return flask.jsonify({'ok': False, 'message': 'At least one file is required in "images"'}), 400
+        if len(images) > config.BATCH_ENDPOINT_MAX_IMAGES:
+            return flask.jsonify({
+                'ok': False,
+                'message': f'At most {config.BATCH_ENDPOINT_MAX_IMAGES} images can be sent per request'
+            }), 400
+
+        detections = [result['label'] for result in predict_uploads(images)]
+
+        results = []
+        histories = []
+        for image, detection in zip(images, detections):
+            plant = detection.split('___')[0]
+            plant_info, disease_info = catalog.lookup(detection)
+            plant_info = plant_info or fallback_plant_info(plant)
+            disease_info = disease_info or fallback_disease_info(detection)
+            validated_detectionHistory = validate_detectionHistory(
+                build_detection_history(detection, plant_info, disease_info))
+            histories.append(validated_detectionHistory['data'])
+            results.append({'filename': image.filename, 'detection': detection,
+                            'plant': plant_info, 'disease': disease_info})
+
+        history_writer.add_many(histories)
+        return flask.jsonify({'ok': True, 'results': results})
+    except HTTPException as ex:
+        return upload_rejected(ex)
+    except Exception as ex:
+        import traceback
+        traceback.print_exc()
+        return flask.jsonify({'ok': False, 'message': 'Bad request parameters: {}'.format(ex)}), 500
+
+
 @blueprint.route('/api/dl/live-details', methods=['POST'])
 @cross_origin(supports_credentials=True)
 def get_live_details():
@@ -127,7 +261,7 @@ def get_live_details():
         
         # Use disease_label if provided, otherwise try to find it in database
         if not disease_label:
-            disease_doc = mongo.db.disease.find_one({'name': {'$regex': disease_name.replace(' ', '_'), '$options': 'i'}})
+            disease_doc = catalog.find_disease(disease_name, plant_name)
             if disease_doc and 'name' in disease_doc:
                 disease_label = disease_doc['name']
             else:
@@ -0,0 +1,62 @@
+import flask
+from flask_cors import cross_origin
+
+from app import config
+from app.controllers import blueprint, mongo, request
+from app.export import FORMATS, encode_bytes, encode_rows, iter_history, parse_position
+from app.history import InvalidCursor, page_history
+
+
+@blueprint.route('/api/dl/history', methods=['GET'])
+@cross_origin(supports_credentials=True)
+def history():
+    """
+    Detection history, newest first, across the hot and archived tiers, e.g.
+    /api/dl/history?limit=50&class=Tomato___Early_blight&state=MH&from=2026-10-01&to=2026-10-18
+    Pass the returned nextCursor as ?cursor= for the following page.
+    """
+    try:
+        limit = max(1, min(int(request.args.get('limit', 50)), config.HISTORY_PAGE_MAX))
+    except ValueError:
+        return flask.jsonify({'ok': False, 'message': 'limit must be an integer'}), 400
+    try:
+        items, next_cursor = page_history(
+            mongo.db, limit, cold_collection=config.HISTORY_COLD_COLLECTION,
+            detected_class=request.args.get('class'), state=request.args.get('state'),
+            start=request.args.get('from'), end=request.args.get('to'), cursor=request.args.get('cursor'))
+    except InvalidCursor as ex:
+        return flask.jsonify({'ok': False, 'message': str(ex)}), 400
+    except Exception as ex:
+        import traceback
+        traceback.print_exc()
+        return flask.jsonify({'ok': False, 'message': f'Error reading history: {ex}'}), 500
+    return flask.jsonify({'ok': True, 'items': items, 'nextCursor': next_cursor})
+
+
+@blueprint.route('/api/dl/history/export', methods=['GET'])
+@cross_origin(supports_credentials=True)
+def export_history():
+    """
+    Stream detection history as NDJSON or CSV in (createdAt, _id) order, e.g.
+    /api/dl/history/export?format=csv&gzip=1&from=2026-01-01&to=2026-06-30&class=Tomato___Early_blight
+    An interrupted download resumes with ?after=<createdAt>,<_id> of the last row received.
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        return flask.jsonify({'ok': False, 'message': f'format must be one of {", ".join(FORMATS)}'}), 400
+    compress = request.args.get('gzip') in ('1', 'true')
+    after = request.args.get('after')
+    try:
+        after = parse_position(after) if after else None
+    except ValueError as ex:
+        return flask.jsonify({'ok': False, 'message': str(ex)}), 400
+
+    docs = iter_history(mongo.db, after=after, cold_collection=config.HISTORY_COLD_COLLECTION,
+                        batch_size=config.EXPORT_BATCH_SIZE, detected_class=request.args.get('class'),
+                        state=request.args.get('state'), start=request.args.get('from'), end=request.args.get('to'))
+    # Resumed CSV downloads are appended to the first part, don't repeat the header
+    body = encode_bytes(encode_rows(docs, fmt, header=after is None), compress=compress)
+    filename = f'detectionHistory.{fmt}' + ('.gz' if compress else '')
+    return flask.Response(flask.stream_with_context(body),
+                          mimetype='application/gzip' if compress else FORMATS[fmt],
+                          headers={'Content-Disposition': f'attachment; filename="{filename}"'})
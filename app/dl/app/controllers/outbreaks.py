@@ -0,0 +1,107 @@
+import time
+
+import flask
+from flask_cors import cross_origin
+
+from app import config
+from app.controllers import blueprint, mongo, tile_cache, request
+from app.geo import radius_filter, bbox_filter, since_filter, count_by_class, tile_heatmap
+
+DEFAULT_RADIUS_KM = 20.0
+DEFAULT_HOURS = 24 * 7
+MAX_HOURS = 24 * 365
+
+
+class BadParameter(ValueError):
+    pass
+
+
+def float_arg(name, default=None, minimum=None, maximum=None):
+    value = request.args.get(name)
+    if value in (None, ''):
+        if default is None:
+            raise BadParameter(f'{name} is required')
+        return default
+    try:
+        value = float(value)
+    except ValueError:
+        raise BadParameter(f'{name} must be a number')
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        raise BadParameter(f'{name} must be between {minimum} and {maximum}')
+    return value
+
+
+def common_match():
+    """createdAt window (hours, default a week) and optional class/plant filters shared by both modes"""
+    match = since_filter(float_arg('hours', DEFAULT_HOURS, 0, MAX_HOURS))
+    if request.args.get('class'):
+        match['detected_class'] = request.args['class']
+    elif request.args.get('plant'):
+        match['detected_class'] = {'$gte': request.args['plant'] + '___', '$lt': request.args['plant'] + '___~'}
+    return match
+
+
+@blueprint.route('/api/dl/outbreaks', methods=['GET'])
+@cross_origin(supports_credentials=True)
+def outbreaks():
+    """
+    Detection counts per class around a point or inside a box, e.g.
+    /api/dl/outbreaks?lat=19.07&lon=72.87&radiusKm=20&hours=72
+    /api/dl/outbreaks?bbox=72.7,18.9,73.1,19.3
+    """
+    try:
+        match = common_match()
+        if request.args.get('bbox'):
+            try:
+                min_lon, min_lat, max_lon, max_lat = map(float, request.args['bbox'].split(','))
+            except ValueError:
+                raise BadParameter('bbox must be minLon,minLat,maxLon,maxLat')
+            if not (-180 <= min_lon < max_lon <= 180 and -90 <= min_lat < max_lat <= 90):
+                raise BadParameter('bbox must be minLon,minLat,maxLon,maxLat within -180..180, -90..90')
+            match.update(bbox_filter(min_lon, min_lat, max_lon, max_lat))
+            area = {'bbox': [min_lon, min_lat, max_lon, max_lat]}
+        else:
+            lat = float_arg('lat', minimum=-90, maximum=90)
+            lon = float_arg('lon', minimum=-360, maximum=360)
+            radius_km = float_arg('radiusKm', DEFAULT_RADIUS_KM, 0, config.OUTBREAK_MAX_RADIUS_KM)
+            match.update(radius_filter(lat, lon, radius_km))
+            area = {'lat': lat, 'lon': lon, 'radiusKm': radius_km}
+    except BadParameter as ex:
+        return flask.jsonify({'ok': False, 'message': str(ex)}), 400
+    try:
+        diseases = count_by_class(mongo.db.detectionHistory, match)
+    except Exception as ex:
+        import traceback
+        traceback.print_exc()
+        return flask.jsonify({'ok': False, 'message': f'Error querying outbreaks: {ex}'}), 500
+    return flask.jsonify({'ok': True, 'area': area, 'since': match['createdAt']['$gte'],
+                          'total': sum(row['count'] for row in diseases), 'diseases': diseases})
+
+
+@blueprint.route('/api/dl/outbreaks/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+@cross_origin(supports_credentials=True)
+def outbreak_tile(z, x, y):
+    """
+    Heatmap tile: detection counts per grid cell of web map tile z/x/y, recomputed
+    at most once per DL_OUTBREAK_TILE_BUCKET_SECONDS. Takes the same hours/class/plant filters.
+    """
+    if not (0 <= z <= 20 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return flask.jsonify({'ok': False, 'message': 'No such tile'}), 404
+    hours = request.args.get('hours', str(DEFAULT_HOURS))
+    key = (z, x, y, hours, request.args.get('class'), request.args.get('plant'))
+    try:
+        match = common_match()
+        tile, bucket = tile_cache.get_or_compute(
+            key, lambda: tile_heatmap(mongo.db.detectionHistory, z, x, y, match, grid=config.OUTBREAK_TILE_GRID))
+    except BadParameter as ex:
+        return flask.jsonify({'ok': False, 'message': str(ex)}), 400
+    except Exception as ex:
+        import traceback
+        traceback.print_exc()
+        return flask.jsonify({'ok': False, 'message': f'Error computing tile: {ex}'}), 500
+    response = flask.jsonify(dict(tile, ok=True, bucket=bucket))
+    if tile_cache.enabled:
+        # Browsers and proxies may keep the tile until the bucket ends
+        remaining = int((bucket + 1) * tile_cache.bucket_seconds - time.time())
+        response.headers['Cache-Control'] = f'public, max-age={max(0, remaining)}'
+    return response
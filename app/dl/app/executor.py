@@ -0,0 +1,112 @@
+"""
+Inference executor
+Every forward pass goes through here, so the number running at once is capped
+and PyTorch's thread pools are sized for that number instead of each request
+thread fanning out across all cores
+"""
+import os
+import threading
+import time
+
+import torch
+
+
+def available_cpus():
+    """CPUs this process may run on (respects taskset/cgroup cpusets)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class InferenceExecutor:
+    """
+    Wraps the model (anything with ResNet's preprocess / predict_results /
+    dtype / model_id interface). Preprocessing runs in the caller's thread,
+    forward passes wait for one of `max_concurrency` slots. `processes` is the
+    number of serving processes sharing the machine's cores.
+    """
+
+    def __init__(self, model, max_concurrency=1, intra_op_threads=0, inter_op_threads=1, processes=1):
+        self.model = model
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.processes = max(1, int(processes))
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.running = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    def configure_threads(self):
+        """
+        Split the available cores between the concurrent forward passes of
+        every serving process. Must run in each of them before its first forward
+        pass, PyTorch refuses to resize the inter-op pool once it has been used.
+        """
+        intra = self.intra_op_threads or max(1, available_cpus() // (self.processes * self.max_concurrency))
+        torch.set_num_threads(intra)
+        try:
+            torch.set_num_interop_threads(self.inter_op_threads)
+        except RuntimeError:
+            pass
+        print(f"[EXECUTOR] {self.max_concurrency} concurrent forward passes x {intra} intra-op threads "
+              f"in each of {self.processes} processes")
+
+    def predict_results(self, xb):
+        queued = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+        self._slots.acquire()
+        started = time.perf_counter()
+        with self._lock:
+            self.waiting -= 1
+            self.running += 1
+            self.wait_seconds += started - queued
+        try:
+            results = self.model.predict_results(xb)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            self._slots.release()
+            with self._lock:
+                self.running -= 1
+                self.run_seconds += time.perf_counter() - started
+        with self._lock:
+            self.completed += 1
+        return results
+
+    def stats(self):
+        with self._lock:
+            passes = self.completed + self.failed
+            return {
+                'maxConcurrency': self.max_concurrency,
+                'intraOpThreads': torch.get_num_threads(),
+                'running': self.running,
+                'queueDepth': self.waiting,
+                'maxQueueDepth': self.max_waiting,
+                'completed': self.completed,
+                'failed': self.failed,
+                'avgWaitMs': self.wait_seconds / passes * 1000 if passes else 0.0,
+                'avgRunMs': self.run_seconds / passes * 1000 if passes else 0.0,
+            }
+
+    # Pass-through for the rest of the model interface
+
+    @property
+    def dtype(self):
+        return self.model.dtype
+
+    @property
+    def model_id(self):
+        return self.model.model_id
+
+    def preprocess(self, image, out=None):
+        return self.model.preprocess(image, out=out)
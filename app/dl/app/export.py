@@ -0,0 +1,124 @@
+"""
+Streaming export of detection history
+Documents are read in (createdAt, _id) order from batched cursors on both
+history tiers, merged lazily, and encoded as NDJSON or CSV chunks, optionally
+gzipped on the fly. Memory stays constant however many rows are exported, and
+an export can be resumed from the createdAt and _id of the last row it produced.
+"""
+import csv
+import heapq
+import io
+import zlib
+
+from bson import json_util
+from bson.json_util import JSONOptions, JSONMode
+from bson.objectid import ObjectId
+from pymongo.errors import CursorNotFound
+
+from app.history import HOT_COLLECTION, history_filter
+
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+CSV_COLUMNS = ['_id', 'createdAt', 'detected_class', 'state', 'district', 'city', 'lat', 'lon',
+               'plantId', 'diseaseId', 'rating']
+JSON_OPTIONS = JSONOptions(json_mode=JSONMode.RELAXED)
+
+
+SORT = [('createdAt', 1), ('_id', 1)]
+
+
+def position(doc):
+    return doc.get('createdAt', ''), doc['_id']
+
+
+def parse_position(value):
+    """(createdAt, _id) from "<createdAt>,<_id>", the form resumed exports pass"""
+    created_at, _, oid = value.rpartition(',')
+    if not created_at or not ObjectId.is_valid(oid):
+        raise ValueError('after must be "<createdAt>,<_id>" of the last row received')
+    return created_at, ObjectId(oid)
+
+
+def after_filter(query, after):
+    """`query` restricted to documents past the (createdAt, _id) position `after`"""
+    created_at, oid = after
+    keyset = {'$or': [{'createdAt': {'$gt': created_at}}, {'createdAt': created_at, '_id': {'$gt': oid}}]}
+    return {'$and': [query, keyset]} if query else keyset
+
+
+def iter_collection(collection, query, after=None, batch_size=1000):
+    """
+    Documents matching `query` past the (createdAt, _id) position `after`, in that
+    order, surviving cursor timeouts. The createdAt_id index (app/indexes.py,
+    app/history.py COLD_INDEXES) serves both the range and the sort; a time-series
+    cold tier without it sorts, which may spill to disk.
+    """
+    while True:
+        bounded = after_filter(query, after) if after is not None else query
+        try:
+            cursor = collection.find(bounded, {'ts': 0}, allow_disk_use=True).sort(SORT).batch_size(batch_size)
+            for doc in cursor:
+                after = position(doc)
+                yield doc
+            return
+        except CursorNotFound:
+            # The consumer was slower than the server's idle cursor timeout, pick up where it stopped
+            continue
+
+
+def iter_history(db, after=None, cold_collection=None, batch_size=1000, **criteria):
+    """
+    Hot and cold history in one (createdAt, _id) ordered stream, see
+    app.history.history_filter for criteria and parse_position for `after`
+    """
+    query = history_filter(**criteria)
+    after = parse_position(after) if isinstance(after, str) else after
+    streams = [iter_collection(db[HOT_COLLECTION], query, after, batch_size)]
+    if cold_collection:
+        streams.append(iter_collection(db[cold_collection], query, after, batch_size))
+    last = None
+    for doc in heapq.merge(*streams, key=position):
+        # A record caught mid-archive is in both tiers
+        if doc['_id'] != last:
+            last = doc['_id']
+            yield doc
+
+
+def csv_row(doc):
+    location = doc.get('location') or {}
+    row = {column: doc.get(column, '') for column in CSV_COLUMNS}
+    row.update(lat=location.get('lat', ''), lon=location.get('lon', ''))
+    return [str(row[column]) for column in CSV_COLUMNS]
+
+
+def encode_rows(docs, fmt='ndjson', rows_per_chunk=500, header=True):
+    """Text chunks of `rows_per_chunk` encoded documents"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer and header:
+        writer.writerow(CSV_COLUMNS)
+    rows = 0
+    for doc in docs:
+        if writer:
+            writer.writerow(csv_row(doc))
+        else:
+            buffer.write(json_util.dumps(doc, json_options=JSON_OPTIONS) + '\n')
+        rows += 1
+        if rows % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def encode_bytes(chunks, compress=False):
+    """UTF-8 bytes of text chunks, as one gzip stream when `compress`"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits 31: gzip container
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        if compressor:
+            data = compressor.compress(data)
+        if data:
+            yield data
+    if compressor:
+        yield compressor.flush()
@@ -0,0 +1,177 @@
+"""
+Geospatial helpers for detection history
+Locations are stored as GeoJSON points in detectionHistory.geo (2dsphere
+indexed). Outbreak queries count detections by class within a radius or a
+bounding box; the tile mode counts them per grid cell of a web map tile, and
+those tiles are cached per time bucket.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+EARTH_RADIUS_KM = 6378.1
+
+
+def wrap_longitude(lon):
+    """Longitude in [-180, 180), e.g. 242.24 -> -117.76"""
+    return (lon + 180.0) % 360.0 - 180.0
+
+
+def geo_point(lat, lon):
+    """GeoJSON point for a latitude/longitude pair (GeoJSON orders coordinates lon, lat)"""
+    return {'type': 'Point', 'coordinates': [round(wrap_longitude(lon), 6), lat]}
+
+
+def radius_filter(lat, lon, radius_km):
+    return {'geo': {'$geoWithin': {'$centerSphere': [[wrap_longitude(lon), lat], radius_km / EARTH_RADIUS_KM]}}}
+
+
+# Counter-clockwise rings under this CRS may cover more than a hemisphere
+STRICT_WINDING_CRS = {'type': 'name', 'properties': {'name': 'urn:x-mongodb:crs:strictwinding:EPSG:4326'}}
+
+# Longitude between two vertices of a box edge, and how far (degrees) edges are pushed out
+EDGE_STEP_DEGREES = 1.0
+EDGE_MARGIN_DEGREES = 1e-6
+
+
+def parallel_edge(lat, from_lon, to_lon, outward):
+    """
+    Vertices of the box edge along `lat`, from `from_lon` to `to_lon`. Each
+    segment is a geodesic, which bows towards the pole: where the box lies on
+    the pole side (`outward` points to the equator) the vertices are moved
+    equatorwards just far enough for every segment to stay outside the box.
+    """
+    lat = max(-90.0, min(90.0, lat + outward * EDGE_MARGIN_DEGREES))
+    if abs(lat) == 90.0:
+        # The edge collapses into the pole
+        return [[from_lon, lat]]
+    steps = max(1, math.ceil(abs(to_lon - from_lon) / EDGE_STEP_DEGREES))
+    if lat * outward < 0:
+        # A segment spanning d degrees peaks at atan(tan(lat) / cos(d / 2)), lower its ends to peak at lat
+        half_step = math.radians(abs(to_lon - from_lon) / steps) / 2
+        lat = math.degrees(math.atan(math.tan(math.radians(lat)) * math.cos(half_step)))
+    return [[(from_lon * (steps - i) + to_lon * i) / steps, lat] for i in range(steps + 1)]
+
+
+def box_ring(min_lon, min_lat, max_lon, max_lat):
+    """Counter-clockwise GeoJSON ring enclosing the lon/lat box, see parallel_edge"""
+    min_lon = max(-180.0, min_lon - EDGE_MARGIN_DEGREES)
+    max_lon = min(180.0, max_lon + EDGE_MARGIN_DEGREES)
+    ring = parallel_edge(min_lat, min_lon, max_lon, -1) + parallel_edge(max_lat, max_lon, min_lon, 1)
+    return ring + [ring[0]]
+
+
+def bbox_filter(min_lon, min_lat, max_lon, max_lat):
+    """
+    Match a lon/lat box exactly. The coordinate ranges decide; the $geoWithin a
+    polygon enclosing the box lets the 2dsphere index find the candidates. Boxes
+    spanning every longitude are bands no polygon can describe (their -180 and
+    180 edges coincide), those are matched by the ranges alone.
+    """
+    match = {'geo.coordinates.0': {'$gte': min_lon, '$lte': max_lon},
+             'geo.coordinates.1': {'$gte': min_lat, '$lte': max_lat}}
+    if max_lon - min_lon < 360:
+        polygon = {'type': 'Polygon', 'coordinates': [box_ring(min_lon, min_lat, max_lon, max_lat)],
+                   'crs': STRICT_WINDING_CRS}
+        match['geo'] = {'$geoWithin': {'$geometry': polygon}}
+    return match
+
+
+def since_filter(hours):
+    # createdAt is str(datetime), compare against the same format
+    return {'createdAt': {'$gte': str(datetime.now() - timedelta(hours=hours))}}
+
+
+def count_by_class(collection, match, limit=50):
+    """Detections per class matching `match`, most frequent first"""
+    pipeline = [
+        {'$match': match},
+        {'$group': {'_id': '$detected_class', 'count': {'$sum': 1}}},
+        {'$sort': {'count': -1}},
+        {'$limit': limit},
+    ]
+    return [{'detected_class': row['_id'], 'count': row['count']} for row in collection.aggregate(pipeline)]
+
+
+def tile_bounds(z, x, y):
+    """(min_lon, min_lat, max_lon, max_lat) of a web mercator (slippy map) tile"""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def tile_heatmap(collection, z, x, y, match, grid=16):
+    """Detection counts per cell of a grid x grid split of tile z/x/y, with each cell's most frequent class"""
+    min_lon, min_lat, max_lon, max_lat = tile_bounds(z, x, y)
+    cell_lon, cell_lat = (max_lon - min_lon) / grid, (max_lat - min_lat) / grid
+    lon, lat = {'$arrayElemAt': ['$geo.coordinates', 0]}, {'$arrayElemAt': ['$geo.coordinates', 1]}
+    cell = {
+        'col': {'$min': [grid - 1, {'$floor': {'$divide': [{'$subtract': [lon, min_lon]}, cell_lon]}}]},
+        'row': {'$min': [grid - 1, {'$floor': {'$divide': [{'$subtract': [max_lat, lat]}, cell_lat]}}]},
+    }
+    pipeline = [
+        {'$match': dict(match, **bbox_filter(min_lon, min_lat, max_lon, max_lat))},
+        {'$group': {'_id': dict(cell, detected_class='$detected_class'), 'count': {'$sum': 1}}},
+        {'$sort': {'count': -1}},
+        {'$group': {'_id': {'col': '$_id.col', 'row': '$_id.row'}, 'count': {'$sum': '$count'},
+                    'top_class': {'$first': '$_id.detected_class'}}},
+    ]
+    cells = []
+    for doc in collection.aggregate(pipeline):
+        col, row = int(doc['_id']['col']), int(doc['_id']['row'])
+        cells.append({'row': row, 'col': col, 'count': doc['count'], 'top_class': doc['top_class'],
+                      'lat': max_lat - (row + 0.5) * cell_lat, 'lon': min_lon + (col + 0.5) * cell_lon})
+    return {'z': z, 'x': x, 'y': y, 'grid': grid, 'bounds': [min_lon, min_lat, max_lon, max_lat], 'cells': cells}
+
+
+class TileCache:
+    """
+    Heatmap tiles keyed by their parameters and the current time bucket.
+    A tile is recomputed at most once per `bucket_seconds`; entries of past
+    buckets are never hit again and age out of the LRU.
+    """
+
+    def __init__(self, max_entries=2048, bucket_seconds=300):
+        self.max_entries = max_entries
+        self.bucket_seconds = bucket_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.bucket_seconds > 0
+
+    def current_bucket(self):
+        return int(time.time() // self.bucket_seconds) if self.enabled else 0
+
+    def get_or_compute(self, key, compute):
+        """(tile, bucket) for `key` in the current bucket, calling compute() on a miss"""
+        bucket = self.current_bucket()
+        if not self.enabled:
+            return compute(), bucket
+        full_key = (bucket, *key)
+        with self._lock:
+            tile = self._entries.get(full_key)
+            if tile is not None:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return tile, bucket
+        # Computed outside the lock, concurrent misses on one tile may both query Mongo
+        tile = compute()
+        with self._lock:
+            self.misses += 1
+            self._entries[full_key] = tile
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return tile, bucket
+
+    def stats(self):
+        return {'enabled': self.enabled, 'entries': len(self._entries), 'bucketSeconds': self.bucket_seconds,
+                'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,120 @@
+"""
+Detection history reads across the hot and cold tiers
+New detections are written to detectionHistory (hot). tools/archive_history.py
+moves records older than N days to a cold collection, optionally a MongoDB
+time-series collection, which stores them compressed. Reads page through both
+tiers with keyset cursors on (createdAt, _id), newest first, so a page costs
+the same whether it is the first or the millionth.
+"""
+import base64
+import heapq
+import json
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+HOT_COLLECTION = 'detectionHistory'
+SORT = [('createdAt', DESCENDING), ('_id', DESCENDING)]
+
+# Created by the archive job together with the cold collection, a time-series
+# collection has to exist before its indexes
+COLD_INDEXES = [
+    IndexModel([('createdAt', DESCENDING), ('_id', DESCENDING)], name='createdAt_id'),
+    IndexModel([('detected_class', ASCENDING), ('createdAt', DESCENDING)], name='detected_class_createdAt'),
+    IndexModel([('state', ASCENDING), ('createdAt', DESCENDING)], name='state_createdAt'),
+]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(doc):
+    """Opaque token for the position just after `doc`"""
+    raw = json.dumps([doc.get('createdAt', ''), str(doc['_id'])]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        created_at, oid = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return created_at, ObjectId(oid)
+    except Exception:
+        raise InvalidCursor('Invalid cursor')
+
+
+def history_filter(detected_class=None, state=None, start=None, end=None, cursor=None):
+    """Mongo filter for the given criteria, positioned after `cursor` when given"""
+    clauses = []
+    if detected_class:
+        clauses.append({'detected_class': detected_class})
+    if state:
+        clauses.append({'state': state})
+    if start:
+        clauses.append({'createdAt': {'$gte': start}})
+    if end:
+        # end is inclusive: "2026-10-18" covers the whole day
+        clauses.append({'createdAt': {'$lt': end + '~'}})
+    if cursor:
+        created_at, oid = decode_cursor(cursor)
+        clauses.append({'$or': [{'createdAt': {'$lt': created_at}},
+                                {'createdAt': created_at, '_id': {'$lt': oid}}]})
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+
+def page_history(db, limit=50, cold_collection=None, **criteria):
+    """
+    One page of history, newest first, as (documents, next cursor or None).
+    Both tiers are read with the same keyset filter and merged, so documents
+    caught mid-move by the archive job are returned once and never skipped.
+    """
+    query = history_filter(**criteria)
+    collections = [db[HOT_COLLECTION]]
+    if cold_collection:
+        collections.append(db[cold_collection])
+    # limit + 1 tells whether another page exists without a count
+    results = [list(collection.find(query, {'ts': 0}).sort(SORT).limit(limit + 1)) for collection in collections]
+    merged, seen = [], set()
+    for doc in heapq.merge(*results, key=lambda doc: (doc.get('createdAt', ''), doc['_id']), reverse=True):
+        if doc['_id'] not in seen:
+            seen.add(doc['_id'])
+            merged.append(doc)
+    page = merged[:limit]
+    next_cursor = encode_cursor(page[-1]) if len(merged) > limit else None
+    return page, next_cursor
+
+
+def archive_batch(db, cutoff, cold_collection, batch_size=1000):
+    """
+    Move up to `batch_size` hot documents created before `cutoff` (a createdAt
+    string) to the cold collection. Copies first and deletes after, skipping
+    documents an interrupted run already copied; returns the number moved.
+    """
+    hot, cold = db[HOT_COLLECTION], db[cold_collection]
+    docs = list(hot.find({'createdAt': {'$lt': cutoff}}).sort('createdAt', ASCENDING).limit(batch_size))
+    if not docs:
+        return 0
+    docs = [with_timestamp(doc) for doc in docs]
+    ids = [doc['_id'] for doc in docs]
+    # A time-series cold tier has no _id index; the ts range limits the lookup to the
+    # buckets this batch falls in instead of scanning the whole archive
+    stamps = [doc['ts'] for doc in docs]
+    already = cold.find({'ts': {'$gte': min(stamps), '$lte': max(stamps)}, '_id': {'$in': ids}}, {'_id': 1})
+    copied = {doc['_id'] for doc in already}
+    missing = [doc for doc in docs if doc['_id'] not in copied]
+    if missing:
+        cold.insert_many(missing, ordered=False)
+    hot.delete_many({'_id': {'$in': ids}})
+    return len(docs)
+
+
+def with_timestamp(doc):
+    """Add the BSON date `ts` a time-series collection needs as its timeField, parsed from createdAt"""
+    try:
+        doc['ts'] = datetime.fromisoformat(doc['createdAt'])
+    except (KeyError, TypeError, ValueError):
+        doc['ts'] = doc['_id'].generation_time.replace(tzinfo=None)
+    return doc
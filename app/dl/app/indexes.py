@@ -0,0 +1,96 @@
+"""
+Indexes of the fasal database and the query shapes that rely on them
+ensure_indexes runs at startup (create_indexes is a no-op for indexes that
+already exist). QUERIES lists every query the service issues, in the form
+tools/explain_queries.py runs through explain to flag collection scans;
+add new queries here together with the index they need.
+"""
+import threading
+
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, IndexModel
+from pymongo.errors import PyMongoError
+
+from app import config
+
+INDEXES = {
+    'disease': [
+        IndexModel([('name', ASCENDING)], name='name_unique', unique=True),
+    ],
+    'plants': [
+        IndexModel([('commonName', ASCENDING)], name='commonName'),
+    ],
+    # Entries are looked up by _id; the TTL index bounds the collection to recent uploads
+    'predictionCache': [
+        IndexModel([('createdAt', ASCENDING)], name='createdAt_ttl',
+                   expireAfterSeconds=config.PREDICTION_CACHE_TTL_DAYS * 24 * 3600),
+    ],
+    # createdAt is stored as str(datetime), which sorts chronologically
+    'detectionHistory': [
+        # Keyset pagination sorts on (createdAt, _id), see app/history.py
+        IndexModel([('createdAt', DESCENDING), ('_id', DESCENDING)], name='createdAt_id'),
+        IndexModel([('detected_class', ASCENDING), ('createdAt', DESCENDING)], name='detected_class_createdAt'),
+        IndexModel([('state', ASCENDING), ('createdAt', DESCENDING)], name='state_createdAt'),
+        IndexModel([('geo', GEOSPHERE), ('createdAt', DESCENDING)], name='geo_createdAt'),
+    ],
+    # Rollup documents are upserted by _id, dashboards filter a bucket range by class or region
+    **{collection: [
+        IndexModel([('bucket', ASCENDING)], name='bucket'),
+        IndexModel([('detected_class', ASCENDING), ('bucket', ASCENDING)], name='detected_class_bucket'),
+        IndexModel([('plant', ASCENDING), ('bucket', ASCENDING)], name='plant_bucket'),
+        IndexModel([('state', ASCENDING), ('district', ASCENDING), ('bucket', ASCENDING)],
+                   name='state_district_bucket'),
+    ] for collection in ('detectionRollupHourly', 'detectionRollupDaily')},
+}
+
+# (description, collection, filter, sort, collection scan expected)
+QUERIES = [
+    ('disease by class label', 'disease', {'name': 'Tomato___Early_blight'}, None, False),
+    ('plant by common name', 'plants', {'commonName': 'Tomato'}, None, False),
+    ('catalog load: all diseases', 'disease', {}, None, True),
+    ('catalog load: all plants', 'plants', {}, None, True),
+    ('catalog version stamp', 'catalogMeta', {'_id': 'catalog'}, None, False),
+    ('prediction cache entry', 'predictionCache', {'_id': '0' * 64}, None, False),
+    ('latest detections', 'detectionHistory', {}, [('createdAt', DESCENDING), ('_id', DESCENDING)], False),
+    ('history page after a cursor', 'detectionHistory',
+     {'$or': [{'createdAt': {'$lt': '2026-10-18 12:00:00'}},
+              {'createdAt': '2026-10-18 12:00:00', '_id': {'$lt': '0' * 24}}]},
+     [('createdAt', DESCENDING), ('_id', DESCENDING)], False),
+    ('detections of a class over time', 'detectionHistory',
+     {'detected_class': 'Tomato___Early_blight', 'createdAt': {'$gte': '2026-01-01'}},
+     [('createdAt', DESCENDING)], False),
+    ('detections in a state over time', 'detectionHistory',
+     {'state': 'MH', 'createdAt': {'$gte': '2026-01-01'}}, [('createdAt', DESCENDING)], False),
+    ('outbreaks within 20km', 'detectionHistory',
+     {'geo': {'$geoWithin': {'$centerSphere': [[72.88, 19.08], 20 / 6378.1]}}, 'createdAt': {'$gte': '2026-01-01'}},
+     None, False),
+    ('history export after a position', 'detectionHistory',
+     {'$and': [{'createdAt': {'$gte': '2026-01-01', '$lt': '2026-06-30~'}},
+               {'$or': [{'createdAt': {'$gt': '2026-03-01 12:00:00'}},
+                        {'createdAt': '2026-03-01 12:00:00', '_id': {'$gt': '0' * 24}}]}]},
+     [('createdAt', ASCENDING), ('_id', ASCENDING)], False),
+    ('analytics: daily counts in a range', 'detectionRollupDaily',
+     {'bucket': {'$gte': '2026-01-01', '$lt': '2026-01-31~'}}, None, False),
+    ('analytics: hourly counts of a class', 'detectionRollupHourly',
+     {'detected_class': 'Tomato___Early_blight', 'bucket': {'$gte': '2026-01-01 00'}}, None, False),
+    ('analytics: daily counts in a district', 'detectionRollupDaily',
+     {'state': 'MH', 'district': 'Mumbai City', 'bucket': {'$gte': '2026-01-01'}}, None, False),
+]
+
+
+def ensure_indexes(db):
+    """Create the indexes in INDEXES, logging (not raising) per collection failures"""
+    created = {}
+    for collection, indexes in INDEXES.items():
+        try:
+            created[collection] = db[collection].create_indexes(indexes)
+        except PyMongoError as ex:
+            # e.g. duplicate disease names blocking the unique index, the service still works without it
+            print(f"[INDEXES] Could not create indexes on {collection}: {ex}")
+    return created
+
+
+def start_ensure_indexes(db):
+    """ensure_indexes on a background thread, so startup never waits for Mongo"""
+    thread = threading.Thread(target=lambda: ensure_indexes(db()), name='dl-ensure-indexes', daemon=True)
+    thread.start()
+    return thread
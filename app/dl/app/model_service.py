@@ -0,0 +1,122 @@
+"""
+Model lifecycle for the detection service
+Loads ResNet off the request path, warms it up with synthetic forward passes
+and reports readiness separately from liveness
+"""
+import threading
+import time
+
+import torch
+
+from app.preprocessing import IMAGE_SIZE
+from app.resnet import ResNet
+
+
+class ModelNotReady(Exception):
+    pass
+
+
+class ModelService:
+    """
+    Wraps the shared ResNet instance. Controllers use the same preprocess /
+    predict_results / dtype / model_id interface as ResNet, which raises
+    ModelNotReady until loading has finished.
+    """
+
+    def __init__(self, factory=ResNet, warmup_iterations=3, warmup_batch_sizes=(1,)):
+        self.factory = factory
+        self.warmup_iterations = warmup_iterations
+        self.warmup_batch_sizes = sorted(set(warmup_batch_sizes))
+        self.state = 'idle'
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self._resnet = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def loaded(self):
+        return self._resnet is not None
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    @property
+    def resnet(self):
+        if self._resnet is None:
+            raise ModelNotReady(f"Model is not loaded yet (state: {self.state})")
+        return self._resnet
+
+    def load(self):
+        """Build the ResNet synchronously, a no-op once loaded"""
+        with self._lock:
+            if self._resnet is not None:
+                return self._resnet
+            self.state = 'loading'
+            start = time.perf_counter()
+            try:
+                self._resnet = self.factory()
+            except Exception as ex:
+                self.state = 'failed'
+                self.error = f'{type(ex).__name__}: {ex}'
+                raise
+            self.load_seconds = time.perf_counter() - start
+            self.state = 'loaded'
+            print(f"[MODEL] Loaded {self._resnet.model_id} in {self.load_seconds:.2f}s")
+            return self._resnet
+
+    def warm_up(self):
+        """Run synthetic forward passes so allocators and kernels are primed before real traffic"""
+        resnet = self.load()
+        self.state = 'warming'
+        start = time.perf_counter()
+        for batch_size in self.warmup_batch_sizes:
+            xb = torch.rand(batch_size, 3, IMAGE_SIZE, IMAGE_SIZE).to(resnet.dtype)
+            for _ in range(self.warmup_iterations):
+                resnet.predict_results(xb)
+        self.warmup_seconds = time.perf_counter() - start
+        self.state = 'ready'
+        print(f"[MODEL] Warmed up in {self.warmup_seconds:.2f}s")
+
+    def start(self):
+        """Load and warm up in a background thread, returns immediately"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._load_and_warm_up, name='dl-model-loader', daemon=True)
+        self._thread.start()
+
+    def _load_and_warm_up(self):
+        try:
+            self.warm_up()
+        except Exception as ex:
+            self.state = 'failed'
+            self.error = self.error or f'{type(ex).__name__}: {ex}'
+            import traceback
+            traceback.print_exc()
+
+    def status(self):
+        return {
+            'state': self.state,
+            'model': self._resnet.model_id if self._resnet is not None else None,
+            'loadSeconds': self.load_seconds,
+            'warmupSeconds': self.warmup_seconds,
+            'error': self.error,
+        }
+
+    # ResNet interface used by the controllers and the batcher
+
+    @property
+    def dtype(self):
+        return self.resnet.dtype
+
+    @property
+    def model_id(self):
+        return self.resnet.model_id
+
+    def preprocess(self, image, out=None):
+        return self.resnet.preprocess(image, out=out)
+
+    def predict_results(self, xb):
+        return self.resnet.predict_results(xb)
@@ -0,0 +1,115 @@
+"""
+Prediction cache keyed by a hash of the uploaded bytes
+Repeated uploads (re-sent photos, frontend retries) skip decoding and inference.
+A bounded in-process LRU sits in front of an optional Mongo collection that
+keeps entries across restarts.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from pymongo.errors import PyMongoError
+
+
+def hash_upload(image, chunk_size=1 << 16):
+    """sha256 of a FileStorage / file-like object's bytes, read in chunks and rewound afterwards"""
+    stream = image.stream if hasattr(image, 'stream') else image
+    stream.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """
+    Maps upload hashes to prediction results ({'label', 'probabilities'}).
+    `collection` is a callable returning the Mongo collection backing the
+    second tier, or None to keep the cache in memory only.
+    """
+
+    def __init__(self, max_entries=1024, collection=None):
+        self.max_entries = max_entries
+        self.collection = collection
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def key_for(self, image, model_id):
+        # Predictions are only reusable for the model that produced them
+        return f"{model_id}:{hash_upload(image)}"
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return result
+
+        result = self._get_persistent(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.mongo_hits += 1
+            self._remember(key, result)
+        return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._remember(key, result)
+        self._put_persistent(key, result)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.mongo_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'maxEntries': self.max_entries,
+                'memoryHits': self.memory_hits,
+                'mongoHits': self.mongo_hits,
+                'misses': self.misses,
+                'hitRate': (self.memory_hits + self.mongo_hits) / lookups if lookups else 0.0,
+            }
+
+    def _remember(self, key, result):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # The Mongo tier is best effort, a failure there must never fail a prediction
+
+    def _get_persistent(self, key):
+        if self.collection is None:
+            return None
+        try:
+            doc = self.collection().find_one({'_id': key}, {'label': 1, 'probabilities': 1})
+        except PyMongoError as ex:
+            print(f"[PREDICTION_CACHE] Lookup failed: {ex}")
+            return None
+        if doc is None:
+            return None
+        return {'label': doc['label'], 'probabilities': doc['probabilities']}
+
+    def _put_persistent(self, key, result):
+        if self.collection is None:
+            return
+        try:
+            self.collection().update_one(
+                {'_id': key},
+                {'$set': {'label': result['label'], 'probabilities': result['probabilities'],
+                          # A BSON date (UTC), the TTL index in app/indexes.py expires entries by it
+                          'createdAt': datetime.utcnow()}},
+                upsert=True)
+        except PyMongoError as ex:
+            print(f"[PREDICTION_CACHE] Store failed: {ex}")
@@ -0,0 +1,57 @@
+"""
+Image preprocessing for ResNet9
+Decodes uploads straight to 256 x 256 RGB uint8 and normalizes them into a
+caller-provided tensor in a single pass
+"""
+import numpy as np
+import torch
+from PIL import Image
+
+IMAGE_SIZE = 256
+
+
+def open_image(image):
+    """Open a FileStorage, file-like object or path without decoding its pixels"""
+    if hasattr(image, 'stream'):
+        # It's a FileStorage object, seek to beginning and read from stream
+        image.stream.seek(0)
+        return Image.open(image.stream)
+    if hasattr(image, 'read'):
+        image.seek(0)
+    return Image.open(image)
+
+
+def decode_image(image, size=IMAGE_SIZE):
+    """Decode an image (or an already opened PIL image) into a size x size x 3 uint8 array"""
+    img = image if isinstance(image, Image.Image) else open_image(image)
+    # Only the header has been read so far, pick the decode scale from it
+    if img.format in ('JPEG', 'MPO'):
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale, never below the target size,
+        # so a 12MP photo is never fully materialized
+        img.draft('RGB', (size, size))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    # Formats without draft support are box-reduced by an integer factor before
+    # the final resample when they are at least 3x the target size
+    reducing_gap = 3.0 if min(img.size) >= 3 * size else None
+    img = img.resize((size, size), reducing_gap=reducing_gap)
+    return np.asarray(img)
+
+
+def normalize_into(pixels, out):
+    """Write H x W x 3 uint8 pixels into a 3 x H x W tensor `out` as floats in [0, 1]"""
+    chw = pixels.transpose(2, 0, 1)
+    if out.dtype == torch.bfloat16:
+        # NumPy has no bfloat16, let torch cast and scale in place
+        out.copy_(torch.from_numpy(np.ascontiguousarray(chw))).div_(255)
+    else:
+        # One fused cast + divide, straight into the tensor's memory
+        np.divide(chw, 255, out=out.numpy(), dtype=out.numpy().dtype)
+    return out
+
+
+def preprocess_image(image, dtype=torch.float32, out=None, size=IMAGE_SIZE):
+    """Decode and normalize an image, allocating the output tensor unless `out` is given"""
+    if out is None:
+        out = torch.empty(3, size, size, dtype=dtype)
+    return normalize_into(decode_image(image, size), out)
@@ -0,0 +1,79 @@
+"""
+Post-training static INT8 quantization for ResNet9
+"""
+import torch
+import torch.nn as nn
+from torch.quantization import QuantStub, DeQuantStub
+
+from app.backends import quantized_engine, save_torchscript
+from app.resnet9 import ResNet9, DEFAULT_WIDTHS
+
+
+class QuantizableResNet9(ResNet9):
+    """
+    ResNet9 with quant/dequant stubs at the edges and the residual additions
+    routed through FloatFunctional so they can be quantized.
+    Shares its state dict layout with ResNet9.
+    """
+
+    def __init__(self, in_channels, num_diseases, widths=DEFAULT_WIDTHS):
+        super().__init__(in_channels, num_diseases, widths=widths)
+        self.quant = QuantStub()
+        self.dequant = DeQuantStub()
+        self.res1_add = nn.quantized.FloatFunctional()
+        self.res2_add = nn.quantized.FloatFunctional()
+
+    def forward(self, xb):
+        out = self.quant(xb)
+        out = self.conv1(out)
+        out = self.conv2(out)
+        out = self.res1_add.add(self.res1(out), out)
+        out = self.conv3(out)
+        out = self.conv4(out)
+        out = self.res2_add.add(self.res2(out), out)
+        out = self.classifier(out)
+        return self.dequant(out)
+
+    def fuse_model(self):
+        """Fuse every ConvBlock Conv2d/BatchNorm2d/ReLU triple into a single module"""
+        for module in self.modules():
+            if (isinstance(module, nn.Sequential) and len(module) >= 3
+                    and isinstance(module[0], nn.Conv2d)
+                    and isinstance(module[1], nn.BatchNorm2d)
+                    and isinstance(module[2], nn.ReLU)):
+                torch.quantization.fuse_modules(module, ['0', '1', '2'], inplace=True)
+
+
+def quantize_resnet9(state_dict, calibration_batches, num_diseases=38, widths=DEFAULT_WIDTHS):
+    """
+    Build a static INT8 ResNet9 from a float state dict, calibrating the
+    activation observers on `calibration_batches` (an iterable of float32
+    N x 3 x 256 x 256 tensors)
+    """
+    engine = quantized_engine()
+    torch.backends.quantized.engine = engine
+
+    model = QuantizableResNet9(3, num_diseases, widths=widths)
+    model.load_state_dict(state_dict)
+    model.float()
+    model.eval()
+    model.fuse_model()
+    model.qconfig = torch.quantization.get_default_qconfig(engine)
+    torch.quantization.prepare(model, inplace=True)
+
+    with torch.no_grad():
+        for xb in calibration_batches:
+            model(xb)
+
+    torch.quantization.convert(model, inplace=True)
+    return model
+
+
+def save_int8(model, path, metadata=None):
+    """Trace the quantized model and save it as a TorchScript artifact"""
+    example = torch.rand(1, 3, 256, 256)
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example)
+    meta = {'format': 'int8', 'precision': 'float32', 'engine': torch.backends.quantized.engine}
+    meta.update(metadata or {})
+    save_torchscript(traced, path, meta)
@@ -1,89 +1,44 @@
+import hashlib
 import os
 import torch
-import dill as dill
-from torchvision import models
-import torchvision.transforms as transforms   # for transforming images into tensors 
-from torchvision.datasets import ImageFolder  # for working with classes and images
-import torch.nn.functional as F # for functions for calculating loss
-import torch.nn as nn           # for creating  neural networks
-import numpy as np 
-from PIL import Image
+from app import config
+from app.backends import create_backend
+from app.catalog import read_class_labels
+from app.preprocessing import preprocess_image
 
-# for calculating the accuracy
-def accuracy(outputs, labels):
-    _, preds = torch.max(outputs, dim=1)
-    return torch.tensor(torch.sum(preds == labels).item() / len(preds))
 
+def file_fingerprint(path, chunk_size=1 << 20):
+    """Short sha256 of a model artifact, so cached predictions die with the weights that made them"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
 
-class ImageClassificationBase(nn.Module):
-    
-    def training_step(self, batch):
-        images, labels = batch
-        out = self(images)                  # Generate predictions
-        loss = F.cross_entropy(out, labels) # Calculate loss
-        return loss
-    
-    def validation_step(self, batch):
-        images, labels = batch
-        out = self(images)                   # Generate prediction
-        loss = F.cross_entropy(out, labels)  # Calculate loss
-        acc = accuracy(out, labels)          # Calculate accuracy
-        return {"val_loss": loss.detach(), "val_accuracy": acc}
-    
-    def validation_epoch_end(self, outputs):
-        batch_losses = [x["val_loss"] for x in outputs]
-        batch_accuracy = [x["val_accuracy"] for x in outputs]
-        epoch_loss = torch.stack(batch_losses).mean()       # Combine loss  
-        epoch_accuracy = torch.stack(batch_accuracy).mean()
-        return {"val_loss": epoch_loss, "val_accuracy": epoch_accuracy} # Combine accuracies
-    
-    def epoch_end(self, epoch, result):
-        print("Epoch [{}], last_lr: {:.5f}, train_loss: {:.4f}, val_loss: {:.4f}, val_acc: {:.4f}".format(
-            epoch, result['lrs'][-1], result['train_loss'], result['val_loss'], result['val_accuracy']))
-
-def ConvBlock(in_channels, out_channels, pool=False):
-    layers = [nn.Conv2d(in_channels, out_channels, kernel_size=3, padding=1),
-             nn.BatchNorm2d(out_channels),
-             nn.ReLU(inplace=True)]
-    if pool:
-        layers.append(nn.MaxPool2d(4))
-    return nn.Sequential(*layers)
-
-class ResNet9(ImageClassificationBase):
-    def __init__(self, in_channels, num_diseases):
-        super().__init__()
-        
-        self.conv1 = ConvBlock(in_channels, 64)
-        self.conv2 = ConvBlock(64, 128, pool=True) # out_dim : 128 x 64 x 64 
-        self.res1 = nn.Sequential(ConvBlock(128, 128), ConvBlock(128, 128))
-        
-        self.conv3 = ConvBlock(128, 256, pool=True) # out_dim : 256 x 16 x 16
-        self.conv4 = ConvBlock(256, 512, pool=True) # out_dim : 512 x 4 x 44
-        self.res2 = nn.Sequential(ConvBlock(512, 512), ConvBlock(512, 512))
-        
-        self.classifier = nn.Sequential(nn.MaxPool2d(4),
-                                       nn.Flatten(),
-                                       nn.Linear(512, num_diseases))
-        
-    def forward(self, xb): # xb is the loaded batch
-        out = self.conv1(xb)
-        out = self.conv2(out)
-        out = self.res1(out) + out
-        out = self.conv3(out)
-        out = self.conv4(out)
-        out = self.res2(out) + out
-        out = self.classifier(out)
-        return out        
 
 class ResNet:
-    model = ResNet9(3,38)
     classes = []
-    def __init__(self):
-        PATH = f'{os. getcwd()}/app/ResNet/plant-disease-model.pth'
-        self.model.load_state_dict(torch.load(PATH,map_location=torch.device('cpu')))
-        self.model.eval()
-        self.model.double()
-        self.classes = open(f"{os. getcwd()}/app/classes.txt","r").read().split(',')
+    def __init__(self, precision=config.PRECISION, model_path=config.MODEL_PATH, model_format=config.MODEL_FORMAT,
+                 backend=config.BACKEND, cascade_head_path=config.CASCADE_HEAD_PATH):
+        self.backend = create_backend(backend, model_path, model_format=model_format, precision=precision,
+                                      onnx_threads=config.ONNX_THREADS, shared_memory=config.SHARED_WEIGHTS,
+                                      cascade_head_path=cascade_head_path,
+                                      cascade_threshold=config.CASCADE_THRESHOLD)
+        self.precision = self.backend.precision
+        self.dtype = self.backend.dtype
+        # Identifies which model produced a prediction, e.g. for cache keys; the content hashes
+        # change when new weights or a new cascade head are dropped in at the same path
+        self.model_id = (f"{self.backend.name}:{model_format}:{os.path.basename(model_path)}"
+                         f"#{file_fingerprint(model_path)}:{self.precision}")
+        if cascade_head_path:
+            self.model_id += (f":{os.path.basename(cascade_head_path)}#{file_fingerprint(cascade_head_path)}"
+                              f"@{config.CASCADE_THRESHOLD}")
+        self.classes = read_class_labels()
+
+    @property
+    def model(self):
+        """The underlying PyTorch module, only available on the torch backend"""
+        return getattr(self.backend, 'model', None)
 
     def to_device(self,data, device):
         """Move tensor(s) to chosen device"""
@@ -91,45 +46,35 @@ class ResNet:
             return [to_device(x, device) for x in data]
         return data.to(device, non_blocking=True)
     
-    def predict_image_from_path(self):
-        test_dir = f"{os. getcwd()}/test"
-        test = ImageFolder(test_dir, transform=transforms.ToTensor())
-        # Retrieve the class label
-        for i in range(25):
-            img, label = test[i]
-            """Converts image to array and return the predicted class
-                with highest probability"""
-            # Convert to a batch of 1
-            xb = self.to_device(img.unsqueeze(0),"cpu")
-            # Get predictions from model
-            yb = self.model(xb)
-            # Pick index with highest probability
-            _, preds  = torch.max(yb, dim=1)
-        return self.classes[preds[0].item()]
+    def preprocess(self,image,out=None):
+        """Decode an uploaded image into a single 3 x 256 x 256 tensor, written into `out` when given"""
+        return preprocess_image(image, dtype=self.dtype, out=out)
 
-    def predict_image(self,image):
-        print(image)
-        # Handle FileStorage objects from Flask
-        if hasattr(image, 'stream'):
-            # It's a FileStorage object, seek to beginning and read from stream
-            image.stream.seek(0)
-            image_data = Image.open(image.stream).convert("RGB").resize((256, 256))
-        elif hasattr(image, 'read'):
-            # It's a file-like object
-            image.seek(0)
-            image_data = Image.open(image).convert("RGB").resize((256, 256))
-        else:
-            # It's a file path
-            image_data = Image.open(image).convert("RGB").resize((256, 256))
-        
-        image_array = np.double(image_data)
-        image_array = image_array/255.0
-
-        img = transforms.ToTensor()(image_array).double()
-        xb = self.to_device(img.unsqueeze(0),"cpu")
+    def predict_logits(self,xb):
+        """Run one forward pass over a N x 3 x 256 x 256 batch and return float32 logits"""
+        xb = self.to_device(xb,"cpu")
         # Get predictions from model
-        yb = self.model(xb)
+        return self.backend.predict_logits(xb)
+
+    def predict_batch(self,xb):
+        """Run one forward pass over a N x 3 x 256 x 256 batch and return N class labels"""
+        yb = self.predict_logits(xb)
         # Pick index with highest probability
         _, preds  = torch.max(yb, dim=1)
+        return [self.classes[i] for i in preds.tolist()]
 
-        return self.classes[preds[0].item()]
\ No newline at end of file
+    def predict_results(self,xb):
+        """Like predict_batch, but each result also carries the per-class probabilities"""
+        return self.postprocess(self.predict_logits(xb))
+
+    def postprocess(self,yb):
+        """Turn a batch of logits into {'label', 'probabilities'} results"""
+        probs = torch.softmax(yb, dim=1)
+        _, preds  = torch.max(probs, dim=1)
+        return [{'label': self.classes[i], 'probabilities': p}
+                for i, p in zip(preds.tolist(), probs.tolist())]
+
+    def predict_image(self,image):
+        img = self.preprocess(image)
+        # Convert to a batch of 1
+        return self.predict_batch(img.unsqueeze(0))[0]
@@ -0,0 +1,135 @@
+"""
+ResNet9 architecture and the training helpers it was trained with
+Only needed to build the model from a state dict, TorchScript artifacts load without it
+"""
+import torch
+import torch.nn.functional as F # for functions for calculating loss
+import torch.nn as nn           # for creating  neural networks
+
+# for calculating the accuracy
+def accuracy(outputs, labels):
+    _, preds = torch.max(outputs, dim=1)
+    return torch.tensor(torch.sum(preds == labels).item() / len(preds))
+
+
+class ImageClassificationBase(nn.Module):
+    
+    def training_step(self, batch):
+        images, labels = batch
+        out = self(images)                  # Generate predictions
+        loss = F.cross_entropy(out, labels) # Calculate loss
+        return loss
+    
+    def validation_step(self, batch):
+        images, labels = batch
+        out = self(images)                   # Generate prediction
+        loss = F.cross_entropy(out, labels)  # Calculate loss
+        acc = accuracy(out, labels)          # Calculate accuracy
+        return {"val_loss": loss.detach(), "val_accuracy": acc}
+    
+    def validation_epoch_end(self, outputs):
+        batch_losses = [x["val_loss"] for x in outputs]
+        batch_accuracy = [x["val_accuracy"] for x in outputs]
+        epoch_loss = torch.stack(batch_losses).mean()       # Combine loss  
+        epoch_accuracy = torch.stack(batch_accuracy).mean()
+        return {"val_loss": epoch_loss, "val_accuracy": epoch_accuracy} # Combine accuracies
+    
+    def distillation_step(self, batch, teacher, temperature=4.0, alpha=0.7):
+        """
+        Knowledge distillation loss: KL divergence to the teacher's softened
+        predictions, mixed with cross entropy on labels >= 0 (-1 marks unlabelled images)
+        """
+        images, labels = batch
+        out = self(images)                  # Generate predictions
+        with torch.no_grad():
+            soft_targets = F.softmax(teacher(images) / temperature, dim=1)
+        loss = F.kl_div(F.log_softmax(out / temperature, dim=1), soft_targets,
+                        reduction='batchmean') * temperature ** 2
+        labelled = labels >= 0
+        if labelled.any():
+            loss = alpha * loss + (1 - alpha) * F.cross_entropy(out[labelled], labels[labelled])
+        return loss
+    
+    def epoch_end(self, epoch, result):
+        print("Epoch [{}], last_lr: {:.5f}, train_loss: {:.4f}, val_loss: {:.4f}, val_acc: {:.4f}".format(
+            epoch, result['lrs'][-1], result['train_loss'], result['val_loss'], result['val_accuracy']))
+
+def ConvBlock(in_channels, out_channels, pool=False):
+    layers = [nn.Conv2d(in_channels, out_channels, kernel_size=3, padding=1),
+             nn.BatchNorm2d(out_channels),
+             nn.ReLU(inplace=True)]
+    if pool:
+        layers.append(nn.MaxPool2d(4))
+    return nn.Sequential(*layers)
+
+# Output channels of conv1, conv2/res1, conv3 and conv4/res2
+DEFAULT_WIDTHS = (64, 128, 256, 512)
+
+class ResNet9(ImageClassificationBase):
+    def __init__(self, in_channels, num_diseases, widths=DEFAULT_WIDTHS):
+        super().__init__()
+        w1, w2, w3, w4 = widths
+        self.widths = tuple(widths)
+        
+        self.conv1 = ConvBlock(in_channels, w1)
+        self.conv2 = ConvBlock(w1, w2, pool=True) # out_dim : 128 x 64 x 64 
+        self.res1 = nn.Sequential(ConvBlock(w2, w2), ConvBlock(w2, w2))
+        
+        self.conv3 = ConvBlock(w2, w3, pool=True) # out_dim : 256 x 16 x 16
+        self.conv4 = ConvBlock(w3, w4, pool=True) # out_dim : 512 x 4 x 44
+        self.res2 = nn.Sequential(ConvBlock(w4, w4), ConvBlock(w4, w4))
+        
+        self.classifier = nn.Sequential(nn.MaxPool2d(4),
+                                       nn.Flatten(),
+                                       nn.Linear(w4, num_diseases))
+        
+    def forward(self, xb): # xb is the loaded batch
+        return self.forward_stage2(self.forward_stage1(xb))
+
+    def forward_stage1(self, xb):
+        """Cheap first stage up to res1, out_dim : 128 x 64 x 64"""
+        out = self.conv1(xb)
+        out = self.conv2(out)
+        out = self.res1(out) + out
+        return out
+
+    def forward_stage2(self, out):
+        """Expensive 256/512 channel stage and the classifier"""
+        out = self.conv3(out)
+        out = self.conv4(out)
+        out = self.res2(out) + out
+        out = self.classifier(out)
+        return out
+
+
+class EarlyExitHead(nn.Module):
+    """Classifier on the stage 1 (res1) features of ResNet9, used by the cascade"""
+    def __init__(self, in_channels, num_diseases):
+        super().__init__()
+        self.classifier = nn.Sequential(nn.AdaptiveAvgPool2d(1),
+                                        nn.Flatten(),
+                                        nn.Linear(in_channels, num_diseases))
+
+    def forward(self, features):
+        return self.classifier(features)
+
+
+def load_resnet9(path, num_diseases=38):
+    """
+    Build a ResNet9 from a plain state dict (plant-disease-model.pth) or from a
+    {'widths', 'num_diseases', 'state_dict'} checkpoint written by save_resnet9
+    """
+    checkpoint = torch.load(path, map_location=torch.device('cpu'))
+    if 'state_dict' in checkpoint:
+        model = ResNet9(3, checkpoint.get('num_diseases', num_diseases), widths=checkpoint['widths'])
+        model.load_state_dict(checkpoint['state_dict'])
+    else:
+        model = ResNet9(3, num_diseases)
+        model.load_state_dict(checkpoint)
+    return model
+
+
+def save_resnet9(model, path):
+    """Save a (possibly slimmed) ResNet9 along with the widths needed to rebuild it"""
+    torch.save({'widths': list(model.widths), 'num_diseases': model.classifier[-1].out_features,
+                'state_dict': model.state_dict()}, path)
@@ -29,6 +29,20 @@ detectionHistory_schema = {
                  "type": "number",
             }
         },
+        "geo": {
+            "type": "object",
+            "properties": {
+                "type": {"enum": ["Point"]},
+                "coordinates": {
+                    "type": "array",
+                    # [lon, lat], lon already wrapped to [-180, 180) by app.geo.geo_point
+                    "items": {"type": "number", "minimum": -180, "maximum": 180},
+                    "minItems": 2,
+                    "maxItems": 2
+                }
+            },
+            "required": ["type", "coordinates"]
+        },
         "detected_class":{
             "type": "string",
         },
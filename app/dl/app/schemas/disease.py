@@ -8,6 +8,11 @@ disease_schema = {
         "name": {
             "type": "string",
         },
+        # Other names the disease is searched by (common names, pathogen), see app/catalog.py
+        "aliases": {
+            "type": "array",
+            "items": {"type": "string"},
+        },
         "thumbnail": {
             "type": "string",
         },
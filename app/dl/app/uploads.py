@@ -0,0 +1,75 @@
+"""
+Bounded handling of image uploads
+Multipart file parts are streamed into temporary files that stay in memory up
+to a spool threshold and move to disk beyond it, with the per-file size limit
+and the declared content type enforced while the body is read. Images are then
+checked from their header alone (format and dimensions) before any decoding.
+"""
+import tempfile
+
+from flask import Request
+from PIL import UnidentifiedImageError
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+from app import config
+from app.preprocessing import open_image
+
+# Formats Pillow decodes that are worth classifying, as reported by Image.format
+IMAGE_FORMATS = {'JPEG', 'MPO', 'PNG', 'WEBP', 'BMP', 'GIF', 'TIFF'}
+
+# Clients that do not know a file's type send it as octet-stream, its header decides
+GENERIC_CONTENT_TYPES = {'', 'application/octet-stream'}
+
+
+class LimitedSpooledFile(tempfile.SpooledTemporaryFile):
+    """SpooledTemporaryFile that refuses to grow past `max_bytes`"""
+
+    def __init__(self, max_bytes, spool_bytes):
+        super().__init__(max_size=spool_bytes)
+        self.max_bytes = max_bytes
+        self.bytes_written = 0
+
+    def write(self, s):
+        self.bytes_written += len(s)
+        if self.bytes_written > self.max_bytes:
+            self.close()
+            raise RequestEntityTooLarge(f'Each image must be at most {self.max_bytes} bytes')
+        return super().write(s)
+
+
+class UploadRequest(Request):
+    """Request class applying the upload limits while the multipart body is parsed"""
+
+    # Non-file form fields are never large here
+    max_form_memory_size = 1024 * 1024
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        mimetype = (content_type or '').split(';')[0].strip().lower()
+        if not mimetype.startswith('image/') and mimetype not in GENERIC_CONTENT_TYPES:
+            raise UnsupportedMediaType(f'Unsupported content type "{mimetype}" for {filename or "upload"}')
+        return LimitedSpooledFile(config.MAX_UPLOAD_BYTES, config.UPLOAD_SPOOL_BYTES)
+
+
+def check_image(image, max_pixels=None):
+    """
+    Validate an upload from its header without decoding pixels, raising
+    UnsupportedMediaType for non-images and RequestEntityTooLarge for images
+    whose decoded size would exceed `max_pixels`
+    """
+    max_pixels = config.MAX_IMAGE_PIXELS if max_pixels is None else max_pixels
+    try:
+        img = open_image(image)
+    except (UnidentifiedImageError, OSError):
+        raise UnsupportedMediaType('Upload is not a readable image')
+    if img.format not in IMAGE_FORMATS:
+        raise UnsupportedMediaType(f'Unsupported image format {img.format}')
+    width, height = img.size
+    if max_pixels and width * height > max_pixels:
+        raise RequestEntityTooLarge(f'Image is {width} x {height}, at most {max_pixels} pixels are accepted')
+    return img
+
+
+def configure_uploads(app):
+    """Install UploadRequest and the whole-request size limit on a Flask app"""
+    app.request_class = UploadRequest
+    app.config['MAX_CONTENT_LENGTH'] = config.MAX_REQUEST_BYTES
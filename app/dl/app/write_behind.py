@@ -0,0 +1,224 @@
+"""
+Write-behind buffer for detection history
+Requests hand validated documents to `add` and respond without waiting for
+Mongo. A background thread flushes them with unordered insert_many once
+`flush_size` documents are pending or `flush_ms` has passed. When Mongo is
+unreachable, or more than `max_pending` documents pile up, documents are
+appended to a local JSON lines spill file and replayed once inserts succeed again.
+`on_insert` is called with the documents each insert actually added, e.g. to
+maintain the analytics rollups.
+"""
+import atexit
+import fcntl
+import glob
+import os
+import threading
+import time
+from collections import deque
+
+from bson import json_util
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError, PyMongoError
+
+DUPLICATE_KEY = 11000
+
+
+class WriteBehindBuffer:
+    """
+    `collection` is a callable returning the Mongo collection to write to.
+    Documents get their _id when added, so a batch replayed from the spill
+    file after a partial insert only produces ignorable duplicate key errors.
+    """
+
+    def __init__(self, collection, flush_size=100, flush_ms=1000.0, max_pending=10000, spill_dir=None,
+                 enabled=True, on_insert=None):
+        self.collection = collection
+        self.on_insert = on_insert
+        self.flush_size = max(1, int(flush_size))
+        self.flush_interval = max(0.0, flush_ms) / 1000.0
+        self.max_pending = max(self.flush_size, int(max_pending))
+        self.spill_dir = spill_dir
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pending = deque()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        self._spill_lock = threading.Lock()
+        self.flushed = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.failed_flushes = 0
+        self.failed_callbacks = 0
+        atexit.register(self.close)
+
+    def add(self, doc):
+        """Queue one document (an _id is assigned in place when missing)"""
+        self.add_many([doc])
+
+    def add_many(self, docs):
+        for doc in docs:
+            doc.setdefault('_id', ObjectId())
+        if not self.enabled or self._closed:
+            self._insert(docs)
+            return
+        self._ensure_worker()
+        with self._lock:
+            self._pending.extend(docs)
+            overflow = [self._pending.popleft() for _ in range(max(0, len(self._pending) - self.max_pending))]
+            self._wakeup.notify()
+        if overflow:
+            # Bounded memory: the oldest documents go to disk rather than being dropped
+            self._spill(overflow)
+
+    def flush(self):
+        """Insert everything pending now, spilling what cannot be written"""
+        while True:
+            with self._lock:
+                batch = [self._pending.popleft() for _ in range(min(self.flush_size, len(self._pending)))]
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self):
+        """Stop the background thread and flush what is left, called at interpreter exit"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=10)
+        self.flush()
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'pending': len(self._pending) if self._pid == os.getpid() else 0,
+            'flushed': self.flushed,
+            'spilled': self.spilled,
+            'replayed': self.replayed,
+            'failedFlushes': self.failed_flushes,
+            'failedCallbacks': self.failed_callbacks,
+        }
+
+    def _ensure_worker(self):
+        # Started lazily, and again in forked children where the parent's thread is gone
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pending = deque()
+            self._thread = threading.Thread(target=self._run, name='dl-history-writer', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._wakeup.wait()
+                # The first pending document starts the clock, as in MicroBatcher
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._pending) < self.flush_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wakeup.wait(remaining)
+                if self._closed:
+                    return
+                batch = [self._pending.popleft() for _ in range(min(self.flush_size, len(self._pending)))]
+            try:
+                if batch and self._write(batch):
+                    self._replay_spill()
+            except Exception as ex:
+                # e.g. an unencodable document or an unwritable spill dir, keep the thread alive
+                self.failed_flushes += 1
+                print(f"[HISTORY] Dropping {len(batch)} documents: {ex!r}")
+
+    def _write(self, batch):
+        """insert_many(ordered=False), spilling the batch on failure; True when Mongo accepted it"""
+        try:
+            self._insert(batch)
+        except PyMongoError as ex:
+            self.failed_flushes += 1
+            print(f"[HISTORY] Flush of {len(batch)} documents failed, spilling to disk: {ex}")
+            self._spill(batch)
+            return False
+        self.flushed += len(batch)
+        return True
+
+    def _insert(self, docs):
+        try:
+            self.collection().insert_many(docs, ordered=False)
+            inserted = docs
+        except BulkWriteError as ex:
+            # Duplicates are documents a previous attempt already wrote
+            errors = [error for error in ex.details.get('writeErrors', []) if error.get('code') != DUPLICATE_KEY]
+            if errors or ex.details.get('writeConcernErrors'):
+                raise
+            duplicates = {error['index'] for error in ex.details.get('writeErrors', [])}
+            inserted = [doc for i, doc in enumerate(docs) if i not in duplicates]
+        if self.on_insert is not None and inserted:
+            try:
+                self.on_insert(inserted)
+            except Exception as ex:
+                # The documents are stored, retrying would insert nothing; rebuild derived data instead
+                self.failed_callbacks += 1
+                print(f"[HISTORY] on_insert failed for {len(inserted)} documents: {ex!r}")
+
+    def _spill_path(self):
+        return os.path.join(self.spill_dir, f'detectionHistory.{os.getpid()}.jsonl')
+
+    def _spill(self, docs):
+        if not self.spill_dir:
+            print(f"[HISTORY] No spill directory configured, dropping {len(docs)} documents")
+            return
+        with self._spill_lock:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with self._open_spill_file() as f:
+                for doc in docs:
+                    f.write(json_util.dumps(doc) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        self.spilled += len(docs)
+
+    def _open_spill_file(self):
+        """This process' spill file, locked, and not one a replay has claimed in the meantime"""
+        path = self._spill_path()
+        while True:
+            f = open(path, 'a')
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if os.path.samestat(os.fstat(f.fileno()), os.stat(path)):
+                    return f
+            except FileNotFoundError:
+                pass
+            f.close()
+
+    def _replay_spill(self):
+        """Insert spilled documents from any worker once Mongo is reachable again"""
+        if not self.spill_dir or not os.path.isdir(self.spill_dir):
+            return
+        for path in glob.glob(os.path.join(self.spill_dir, 'detectionHistory.*.jsonl')):
+            # Renaming to a fresh name claims the file: new spills go to a new file, and a
+            # claimed file left behind by a failed replay is picked up again next time
+            claimed = os.path.join(self.spill_dir, f'detectionHistory.replay-{os.getpid()}-{time.time_ns()}.jsonl')
+            try:
+                os.rename(path, claimed)
+                with open(claimed) as f:
+                    # Wait for a spill that opened the file before it was renamed
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    docs = [json_util.loads(line) for line in f if line.strip()]
+            except FileNotFoundError:
+                continue  # claimed by another worker
+            try:
+                for i in range(0, len(docs), self.flush_size):
+                    self._insert(docs[i:i + self.flush_size])
+            except PyMongoError as ex:
+                print(f"[HISTORY] Replay of {claimed} failed, will retry: {ex}")
+                return
+            os.remove(claimed)
+            self.replayed += len(docs)
@@ -0,0 +1,85 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+import numpy as np
+import torch
+from PIL import Image
+
+
+def synthetic_jpeg(width, height, quality=90):
+    """A smooth gradient with noise, closer to a photo than flat colour"""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    rgb = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    rgb += rng.normal(0, 12, rgb.shape).astype(np.float32)
+    buf = io.BytesIO()
+    Image.fromarray(np.clip(rgb, 0, 255).astype(np.uint8)).save(buf, format='JPEG', quality=quality)
+    return buf.getvalue()
+
+
+def phone_jpeg(long_side):
+    """A 4:3 synthetic photo whose long side is `long_side` pixels"""
+    return synthetic_jpeg(long_side, max(1, long_side * 3 // 4))
+
+
+def measure(fn, repeat, warmup=1):
+    """Call fn repeatedly and summarize the wall time of each call in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return summarize(times)
+
+
+def summarize(times_ms):
+    ordered = sorted(times_ms)
+    return {
+        'n': len(ordered),
+        'meanMs': statistics.fmean(ordered),
+        'p50Ms': ordered[len(ordered) // 2],
+        'p95Ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'p99Ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+        'minMs': ordered[0],
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def write_results(path, benchmark, results, parameters=None):
+    """Write one benchmark run as JSON, see benchmarks/compare.py"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'benchmark': benchmark, 'environment': environment(),
+                   'parameters': parameters or {}, 'results': results}, f, indent=2)
+    print(f"Wrote {path}")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark result files (e.g. from two commits)
+Rows are matched on their non-timing fields and compared on p50 latency;
+exits non-zero when any row got slower than --threshold
+
+Usage (from app/dl):
+    python -m benchmarks.compare BASELINE.json CANDIDATE.json [--threshold 0.10]
+"""
+import argparse
+import json
+import sys
+
+METRIC_SUFFIXES = ('Ms', 'PerSecond', 'Bytes')
+METRIC_KEYS = {'n', 'maxDiff', 'bytes'}
+# Latency field compared for each row, in order of preference
+COMPARED = ('p50Ms', 'newMs', 'meanMs')
+
+
+def rows(data):
+    results = data['results']
+    if isinstance(results, dict):
+        for stage, stage_rows in results.items():
+            for row in stage_rows:
+                yield {'stage': stage, **row}
+    else:
+        yield from results
+
+
+def row_key(row):
+    return tuple(sorted((k, v) for k, v in row.items()
+                        if k not in METRIC_KEYS and not k.endswith(METRIC_SUFFIXES)))
+
+
+def compared_value(row):
+    for field in COMPARED:
+        if field in row:
+            return field, row[field]
+    return None, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed relative slowdown')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    print(f"baseline  {baseline['environment'].get('commit')}  {baseline['benchmark']}")
+    print(f"candidate {candidate['environment'].get('commit')}  {candidate['benchmark']}")
+
+    baseline_rows = {row_key(row): row for row in rows(baseline)}
+    regressions = 0
+    for row in rows(candidate):
+        key = row_key(row)
+        if key not in baseline_rows:
+            continue
+        field, new = compared_value(row)
+        _, old = compared_value(baseline_rows[key])
+        if field is None or not old:
+            continue
+        change = (new - old) / old
+        flag = ''
+        if change > args.threshold:
+            regressions += 1
+            flag = '  REGRESSION'
+        label = ' '.join(f'{k}={v}' for k, v in key)
+        print(f"{label:70s} {field} {old:9.2f} -> {new:9.2f} ({change:+7.1%}){flag}")
+
+    print(f"{regressions} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+In-memory stand-in for the parts of the pymongo API the detection routes use
+Lets the route benchmark measure the Flask/inference path without a Mongo server,
+and the tests exercise the history writers and readers against a collection with a unique _id
+"""
+from types import SimpleNamespace
+
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+DUPLICATE_KEY = 11000
+
+
+OPERATORS = {
+    '$in': lambda value, operand: value in operand,
+    '$lt': lambda value, operand: value is not None and value < operand,
+    '$lte': lambda value, operand: value is not None and value <= operand,
+    '$gt': lambda value, operand: value is not None and value > operand,
+    '$gte': lambda value, operand: value is not None and value >= operand,
+}
+
+
+def matches(doc, query):
+    """Equality, the OPERATORS above and $and/$or, on top-level fields"""
+    for key, condition in (query or {}).items():
+        if key == '$and':
+            if not all(matches(doc, clause) for clause in condition):
+                return False
+        elif key == '$or':
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(op in OPERATORS for op in condition):
+            if not all(OPERATORS[op](doc.get(key), operand) for op, operand in condition.items()):
+                return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+def project(doc, projection):
+    """Inclusion ({'_id': 1}) or exclusion ({'ts': 0}) projection"""
+    if not projection:
+        return dict(doc)
+    if any(projection.values()):
+        return {key: value for key, value in doc.items() if projection.get(key, key == '_id')}
+    return {key: value for key, value in doc.items() if key not in projection}
+
+
+class InMemoryCursor:
+    def __init__(self, docs):
+        self.docs = docs
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=1):
+        keys = [(key_or_list, direction)] if isinstance(key_or_list, str) else key_or_list
+        for key, key_direction in reversed(keys):
+            # Stable sorts from the last key to the first give a compound order
+            self.docs.sort(key=lambda doc: doc.get(key), reverse=key_direction < 0)
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size):
+        return self
+
+    def __iter__(self):
+        return iter(self.docs[:self._limit] if self._limit else self.docs)
+
+
+class InMemoryCollection:
+    def __init__(self, docs=()):
+        self.docs = []
+        self.insert_many(list(docs))
+
+    def find(self, query=None, projection=None, **kwargs):
+        return InMemoryCursor([project(doc, projection) for doc in self.docs if matches(doc, query)])
+
+    def find_one(self, query=None, projection=None, **kwargs):
+        for doc in self.docs:
+            if matches(doc, query):
+                return project(doc, projection)
+        return None
+
+    def insert_one(self, doc, **kwargs):
+        doc.setdefault('_id', ObjectId())
+        if any(existing['_id'] == doc['_id'] for existing in self.docs):
+            raise DuplicateKeyError(f"duplicate key {doc['_id']}", DUPLICATE_KEY)
+        self.docs.append(dict(doc))
+        return SimpleNamespace(inserted_id=doc['_id'])
+
+    def insert_many(self, docs, ordered=True, **kwargs):
+        """Duplicate _ids raise BulkWriteError like Mongo, after inserting the rest when unordered"""
+        inserted_ids, errors = [], []
+        for index, doc in enumerate(docs):
+            try:
+                inserted_ids.append(self.insert_one(doc).inserted_id)
+            except DuplicateKeyError:
+                errors.append({'index': index, 'code': DUPLICATE_KEY})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'writeConcernErrors': [], 'nInserted': len(inserted_ids)})
+        return SimpleNamespace(inserted_ids=inserted_ids)
+
+    def update_one(self, query, update, upsert=False, **kwargs):
+        for doc in self.docs:
+            if matches(doc, query):
+                doc.update(update.get('$set', {}))
+                for key, amount in update.get('$inc', {}).items():
+                    doc[key] = doc.get(key, 0) + amount
+                return SimpleNamespace(matched_count=1, upserted_id=None)
+        if upsert:
+            doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            doc.update(update.get('$setOnInsert', {}))
+            doc.update(update.get('$set', {}))
+            doc.update(update.get('$inc', {}))
+            return SimpleNamespace(matched_count=0, upserted_id=self.insert_one(doc).inserted_id)
+        return SimpleNamespace(matched_count=0, upserted_id=None)
+
+    def delete_many(self, query, **kwargs):
+        kept = [doc for doc in self.docs if not matches(doc, query)]
+        deleted, self.docs = len(self.docs) - len(kept), kept
+        return SimpleNamespace(deleted_count=deleted)
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        """UpdateOne requests only"""
+        for request in requests:
+            self.update_one(request._filter, request._doc, upsert=request._upsert)
+        return SimpleNamespace(acknowledged=True)
+
+
+class InMemoryDatabase:
+    """Collections are created on first access, like with pymongo"""
+
+    def __init__(self, **collections):
+        self._collections = {name: InMemoryCollection(docs) for name, docs in collections.items()}
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self._collections.setdefault(name, InMemoryCollection())
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+def seeded_database(classes):
+    """A database with a disease doc per class label and a plant doc per plant"""
+    plants = sorted({label.split('___')[0] for label in classes})
+    return InMemoryDatabase(
+        disease=[{'name': label, 'description': 'benchmark'} for label in classes],
+        plants=[{'commonName': plant, 'scientificName': 'benchmark'} for plant in plants],
+    )
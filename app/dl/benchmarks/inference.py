@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Stage-by-stage benchmark of ResNet.predict_image
+  decode      - JPEG bytes to 256 x 256 uint8 RGB, per input resolution
+  preprocess  - uint8 pixels to a normalized tensor, per precision
+  forward     - model forward pass, per precision x batch size x thread count
+  postprocess - softmax/argmax/labels, per batch size
+
+Usage (from app/dl):
+    python -m benchmarks.inference [--output benchmarks/results/inference.json]
+"""
+import argparse
+import io
+import sys
+
+import torch
+
+from app import config
+from app.backends import PRECISIONS, resolve_precision
+from app.executor import available_cpus
+from app.preprocessing import IMAGE_SIZE, decode_image, normalize_into
+from app.resnet import ResNet
+from benchmarks.common import measure, phone_jpeg, write_results
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+def main():
+    cpus = available_cpus()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--resolutions', type=int_list, default=[256, 512, 1024, 2000, 3000, 4000],
+                        help='long side of the synthetic input photos')
+    parser.add_argument('--precisions', default=','.join(PRECISIONS))
+    parser.add_argument('--batch-sizes', type=int_list, default=[1, 4, 8, 16])
+    parser.add_argument('--threads', type=int_list, default=sorted({1, max(1, cpus // 2), cpus}))
+    parser.add_argument('--backend', default=config.BACKEND)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--output', default='benchmarks/results/inference.json')
+    args = parser.parse_args()
+
+    precisions = [p for p in args.precisions.split(',') if resolve_precision(p) == p]
+    results = {'decode': [], 'preprocess': [], 'forward': [], 'postprocess': []}
+
+    for resolution in args.resolutions:
+        data = phone_jpeg(resolution)
+        stats = measure(lambda: decode_image(io.BytesIO(data)), args.repeat)
+        results['decode'].append({'resolution': resolution, 'bytes': len(data), **stats})
+        print(f"decode      {resolution:5d}px            p50 {stats['p50Ms']:8.2f}ms")
+
+    pixels = decode_image(io.BytesIO(phone_jpeg(1024)))
+    for precision in precisions:
+        out = torch.empty(3, IMAGE_SIZE, IMAGE_SIZE, dtype=PRECISIONS[precision])
+        stats = measure(lambda: normalize_into(pixels, out), args.repeat)
+        results['preprocess'].append({'precision': precision, **stats})
+        print(f"preprocess  {precision:9s}         p50 {stats['p50Ms']:8.2f}ms")
+
+    resnet = None
+    for precision in precisions:
+        if args.backend == 'torch':
+            resnet = ResNet(precision=precision, backend='torch')
+        elif resnet is None:
+            # Other backends fix their precision in the exported model
+            resnet = ResNet(backend=args.backend)
+        for threads in args.threads:
+            torch.set_num_threads(threads)
+            for batch_size in args.batch_sizes:
+                xb = torch.rand(batch_size, 3, IMAGE_SIZE, IMAGE_SIZE).to(resnet.dtype)
+                stats = measure(lambda: resnet.predict_logits(xb), args.repeat)
+                results['forward'].append({'backend': args.backend, 'precision': resnet.precision, 'threads': threads,
+                                           'batchSize': batch_size, 'perImageMs': stats['meanMs'] / batch_size,
+                                           **stats})
+                print(f"forward     {resnet.precision:9s} t={threads:<3d} b={batch_size:<3d} "
+                      f"p50 {stats['p50Ms']:8.2f}ms  {stats['meanMs'] / batch_size:7.2f}ms/img")
+        if args.backend != 'torch':
+            break
+
+    for batch_size in args.batch_sizes:
+        yb = torch.randn(batch_size, len(resnet.classes))
+        stats = measure(lambda: resnet.postprocess(yb), args.repeat)
+        results['postprocess'].append({'batchSize': batch_size, **stats})
+        print(f"postprocess b={batch_size:<3d}             p50 {stats['p50Ms']:8.2f}ms")
+
+    write_results(args.output, 'inference', results,
+                  {k: v for k, v in vars(args).items() if k != 'output'})
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: legacy predict_image preprocessing vs app.preprocessing
+Times both paths on synthetic phone-sized JPEGs and the bundled test images,
+and reports peak Python/NumPy allocations per image and pixel drift
+
+Usage (from app/dl):
+    python -m benchmarks.preprocess [--repeat 5] [--sizes 1024x768,4000x3000] [--output results.json]
+"""
+import argparse
+import glob
+import io
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import torch
+import torchvision.transforms as transforms
+from PIL import Image
+
+from app.preprocessing import preprocess_image
+from benchmarks.common import synthetic_jpeg, write_results
+
+
+def legacy_preprocess(data):
+    """The float64 path predict_image used before app.preprocessing"""
+    image_data = Image.open(io.BytesIO(data)).convert("RGB").resize((256, 256))
+    image_array = np.double(image_data)
+    image_array = image_array/255.0
+    return transforms.ToTensor()(image_array).double()
+
+
+def current_preprocess(data, out):
+    return preprocess_image(io.BytesIO(data), out=out)
+
+
+def measure(fn, repeat):
+    fn()  # warm-up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--sizes', default='640x480,1600x1200,4000x3000',
+                        help='comma separated WIDTHxHEIGHT synthetic JPEGs')
+    parser.add_argument('--images', default='app/test/test/*.JPG', help='glob of real images to include')
+    parser.add_argument('--output', help='also write the results as JSON')
+    args = parser.parse_args()
+
+    inputs = []
+    for size in args.sizes.split(','):
+        width, height = (int(v) for v in size.split('x'))
+        inputs.append((f'synthetic {size}', synthetic_jpeg(width, height)))
+    for path in sorted(glob.glob(args.images))[:3]:
+        with open(path, 'rb') as f:
+            inputs.append((path, f.read()))
+
+    out = torch.empty(3, 256, 256, dtype=torch.float32)
+    results = []
+    print(f"{'input':40s} {'legacy ms':>10s} {'new ms':>8s} {'speedup':>8s} {'legacy peak':>12s} {'new peak':>9s} {'max diff':>9s}")
+    for name, data in inputs:
+        legacy_time, legacy_peak = measure(lambda: legacy_preprocess(data), args.repeat)
+        new_time, new_peak = measure(lambda: current_preprocess(data, out), args.repeat)
+        diff = (legacy_preprocess(data).float() - current_preprocess(data, out)).abs().max().item()
+        print(f"{name[-40:]:40s} {legacy_time * 1000:10.1f} {new_time * 1000:8.1f} {legacy_time / new_time:7.2f}x "
+              f"{legacy_peak / 1e6:10.1f}MB {new_peak / 1e6:7.1f}MB {diff:9.4f}")
+        results.append({'input': name, 'legacyMs': legacy_time * 1000, 'newMs': new_time * 1000,
+                        'legacyPeakBytes': legacy_peak, 'newPeakBytes': new_peak, 'maxDiff': diff})
+    if args.output:
+        write_results(args.output, 'preprocess', results, vars(args))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
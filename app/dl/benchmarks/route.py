@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of /api/dl/detection and /api/dl/detection/batch
+Drives the real Flask app through its test client with Mongo replaced by an
+in-memory stand-in. The prediction cache is disabled so every request decodes
+and runs the model.
+
+Usage (from app/dl):
+    python -m benchmarks.route [--requests 50] [--concurrency 1,8] [--output benchmarks/results/route.json]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Read by app.config at import time
+os.environ['DL_PREDICTION_CACHE_SIZE'] = '0'
+os.environ['DL_PREDICTION_CACHE_MONGO'] = '0'
+# Mongo is swapped for the in-memory stand-in after create_app, keep startup off the real server
+os.environ['DL_ENSURE_INDEXES'] = '0'
+os.environ['DL_ANALYTICS_ROLLUPS'] = '0'
+
+from app import create_app
+from app.controllers import model_service, executor, batcher
+from app.db_config import mongo
+from benchmarks.common import phone_jpeg, summarize, write_results
+from benchmarks.in_memory_mongo import seeded_database
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+def wait_until_ready(timeout):
+    deadline = time.monotonic() + timeout
+    while not model_service.ready:
+        if model_service.state == 'failed' or time.monotonic() > deadline:
+            raise RuntimeError(f"Model did not become ready: {model_service.status()}")
+        time.sleep(0.1)
+
+
+def run(app, requests, concurrency, make_request):
+    def one(_):
+        client = app.test_client()
+        start = time.perf_counter()
+        response = make_request(client)
+        elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return elapsed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+    return {**summarize(latencies), 'requestsPerSecond': requests / wall}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--resolutions', type=int_list, default=[256, 1024, 4000])
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--concurrency', type=int_list, default=[1, 8])
+    parser.add_argument('--batch-images', type=int, default=8, help='images per /detection/batch request')
+    parser.add_argument('--output', default='benchmarks/results/route.json')
+    args = parser.parse_args()
+
+    app = create_app()
+    wait_until_ready(timeout=300)
+    mongo.db = seeded_database(model_service.resnet.classes)
+
+    results = []
+    for resolution in args.resolutions:
+        data = phone_jpeg(resolution)
+
+        def single(client):
+            return client.post('/api/dl/detection', content_type='multipart/form-data',
+                               data={'image': (io.BytesIO(data), 'leaf.jpg')})
+
+        def batch(client):
+            return client.post('/api/dl/detection/batch', content_type='multipart/form-data',
+                               data={'images': [(io.BytesIO(data), f'leaf{i}.jpg') for i in range(args.batch_images)]})
+
+        for concurrency in args.concurrency:
+            for route, make_request in (('/api/dl/detection', single), ('/api/dl/detection/batch', batch)):
+                stats = run(app, args.requests, concurrency, make_request)
+                results.append({'route': route, 'resolution': resolution, 'concurrency': concurrency,
+                                'imagesPerRequest': args.batch_images if route.endswith('batch') else 1, **stats})
+                print(f"{route:26s} {resolution:5d}px c={concurrency:<3d} p50 {stats['p50Ms']:8.1f}ms "
+                      f"p99 {stats['p99Ms']:8.1f}ms {stats['requestsPerSecond']:7.1f} req/s")
+
+    write_results(args.output, 'route', results,
+                  {**{k: v for k, v in vars(args).items() if k != 'output'},
+                   'model': model_service.resnet.model_id, 'batcher': batcher.stats()['maxBatchSize'],
+                   'inferenceConcurrency': executor.max_concurrency})
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,47 @@
+"""
+Gunicorn settings for the detection service
+
+With DL_SHARED_WEIGHTS=1 the app, and with it the model, is loaded once in the
+master process. The weights are moved to shared memory before the workers are
+forked, so all DL_WORKERS workers run inference against the same physical pages.
+
+Each worker serves DL_THREADS requests at once (gthread). Only requests inside
+one worker can share a micro-batch, so the default matches DL_BATCH_MAX_SIZE.
+"""
+import gc
+import os
+
+bind = os.getenv('DL_BIND', '0.0.0.0:8000')
+# Defaults match WORKERS and THREADS in app/config.py, which sizes the PyTorch thread pools from them
+workers = int(os.getenv('DL_WORKERS', '1'))
+threads = int(os.getenv('DL_THREADS', '8'))
+worker_class = 'gthread'
+preload_app = os.getenv('DL_SHARED_WEIGHTS', '0') == '1'
+
+
+def pre_fork(server, worker):
+    # Park everything allocated while preloading in the permanent GC generation,
+    # otherwise collections in the workers touch those objects and copy their pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        # Threads don't survive fork, so each worker sizes its thread pools
+        # and warms up the inherited model itself
+        from app import config
+        from app.controllers import model_service, executor
+        from app.db_config import mongo
+        from app.indexes import start_ensure_indexes
+        executor.configure_threads()
+        model_service.start()
+        # Mongo connections must be opened after the fork; every worker asking is harmless,
+        # create_indexes does nothing for indexes that already exist
+        if config.ENSURE_INDEXES:
+            start_ensure_indexes(lambda: mongo.db)
+
+
+def worker_exit(server, worker):
+    # Flush buffered detection history before the worker goes away
+    from app.controllers import history_writer
+    history_writer.close()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the service as `app`, the way run.py does from app/dl
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -0,0 +1,58 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from app.batcher import MicroBatcher
+
+
+class FakeResNet:
+    """Preprocesses an integer "image" into a tensor holding it, records every forward pass"""
+
+    def __init__(self):
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def preprocess(self, image):
+        return torch.full((3,), float(image))
+
+    def predict_results(self, xb):
+        with self._lock:
+            self.batches.append(len(xb))
+        return [{'label': str(int(x[0].item()))} for x in xb]
+
+
+def test_concurrent_requests_share_one_forward_pass():
+    resnet = FakeResNet()
+    batcher = MicroBatcher(resnet, max_batch_size=8, max_wait_ms=2000)
+    barrier = threading.Barrier(8)
+
+    def request(image):
+        barrier.wait()
+        return batcher.predict(image, timeout=10)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(request, range(8)))
+
+    # A full batch dispatches without waiting out max_wait_ms
+    assert resnet.batches == [8]
+    assert [result['label'] for result in results] == [str(i) for i in range(8)]
+
+
+def test_lone_request_runs_after_the_wait():
+    resnet = FakeResNet()
+    batcher = MicroBatcher(resnet, max_batch_size=8, max_wait_ms=1)
+
+    assert batcher.predict(5, timeout=10) == {'label': '5'}
+    assert resnet.batches == [1]
+
+
+def test_failed_forward_pass_reaches_every_caller():
+    class Broken(FakeResNet):
+        def predict_results(self, xb):
+            raise RuntimeError('boom')
+
+    batcher = MicroBatcher(Broken(), max_batch_size=4, max_wait_ms=50)
+    futures = [batcher.submit(torch.zeros(3)) for _ in range(3)]
+    for future in futures:
+        assert isinstance(future.exception(timeout=10), RuntimeError)
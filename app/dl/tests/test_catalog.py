@@ -0,0 +1,38 @@
+import os
+
+from app.catalog import CatalogCache, read_class_labels
+from benchmarks.in_memory_mongo import InMemoryDatabase
+
+LABELS = read_class_labels(os.path.join(os.path.dirname(__file__), '..', 'app', 'classes.txt'))
+
+
+def catalog_database():
+    db = InMemoryDatabase()
+    db.disease.insert_many([{'name': label} for label in LABELS])
+    db.plants.insert_many([{'commonName': label.split('___')[0]} for label in LABELS])
+    return db
+
+
+def test_find_disease_matches_free_text():
+    catalog = CatalogCache(catalog_database, ttl_seconds=60, labels=LABELS)
+    assert catalog.find_disease('Tomato Yellow Leaf Curl Virus', 'Tomato')['name'] == \
+        'Tomato___Tomato_Yellow_Leaf_Curl_Virus'
+    assert catalog.find_disease('early blight', 'Potato')['name'] == 'Potato___Early_blight'
+    assert catalog.find_disease('Potato Late blite')['name'] == 'Potato___Late_blight'
+    assert catalog.find_disease('!!') is None
+    assert catalog.reloads == 1
+
+
+def test_disabled_cache_fetches_only_the_matched_label():
+    db = catalog_database()
+    queries = []
+    find_one = db.disease.find_one
+    db.disease.find = lambda *args, **kwargs: queries.append(('find', args))
+    db.disease.find_one = lambda query, *args, **kwargs: queries.append(('find_one', query)) or find_one(query)
+
+    catalog = CatalogCache(lambda: db, ttl_seconds=0, labels=LABELS)
+    assert catalog.find_disease('Tomato Yellow Leaf Curl Virus', 'Tomato')['name'] == \
+        'Tomato___Tomato_Yellow_Leaf_Curl_Virus'
+    assert catalog.find_disease('unknown thing entirely') is None
+    assert queries == [('find_one', {'name': 'Tomato___Tomato_Yellow_Leaf_Curl_Virus'})]
+    assert catalog.reloads == 0
@@ -0,0 +1,96 @@
+import csv
+import gzip
+import json
+
+from bson.objectid import ObjectId
+
+from app.export import encode_bytes, encode_rows, iter_history
+from benchmarks.in_memory_mongo import InMemoryDatabase
+from tools.export_history import last_exported_position
+
+COLD = 'detectionHistoryArchive'
+
+
+def detection(created_at):
+    return {'_id': ObjectId(), 'createdAt': created_at, 'detected_class': 'Tomato___Early_blight',
+            'state': 'Punjab', 'location': {'lat': 30.9, 'lon': 75.85}}
+
+
+def history(n, ties=4):
+    """n detections, every `ties` of them sharing a createdAt"""
+    return [detection(f'2026-10-18 {i // ties // 60:02d}:{i // ties % 60:02d}:00.000000') for i in range(n)]
+
+
+def oldest_first(docs):
+    return sorted(docs, key=lambda doc: (doc['createdAt'], doc['_id']))
+
+
+def ids(docs):
+    return [doc['_id'] for doc in docs]
+
+
+def write_export(path, docs, fmt, mode='wb', header=True):
+    with open(path, mode) as f:
+        for chunk in encode_bytes(encode_rows(docs, fmt, rows_per_chunk=50, header=header),
+                                  compress=path.endswith('.gz')):
+            f.write(chunk)
+
+
+def exported_ids(path, fmt):
+    with (gzip.open if path.endswith('.gz') else open)(path, 'rt') as f:
+        if fmt == 'csv':
+            return [ObjectId(row[0]) for row in csv.reader(f) if row[0] != '_id']
+        return [ObjectId(json.loads(line)['_id']['$oid']) for line in f]
+
+
+def test_iter_history_merges_tiers_and_resumes_inside_tied_timestamps():
+    docs = history(40)
+    hot, cold = docs[::2], docs[1::2]
+    # A record copied by the archive job and not yet deleted from the hot tier
+    hot.append(cold[5])
+    db = InMemoryDatabase(detectionHistory=hot, **{COLD: cold})
+
+    exported = list(iter_history(db, cold_collection=COLD, batch_size=3))
+    assert ids(exported) == ids(oldest_first(docs))
+
+    # Resume from a row in the middle of a run of tied createdAt values
+    last = exported[17]
+    assert last['createdAt'] == exported[18]['createdAt']
+    rest = list(iter_history(db, after=f"{last['createdAt']},{last['_id']}", cold_collection=COLD))
+    assert ids(rest) == ids(exported[18:])
+
+
+def test_resume_after_a_truncated_gzip_export(tmp_path):
+    docs = oldest_first(history(3000))
+    db = InMemoryDatabase(detectionHistory=docs)
+    path = str(tmp_path / 'history.ndjson.gz')
+    write_export(path, iter_history(db), 'ndjson')
+    with open(path, 'rb') as f:
+        data = f.read()
+    # An interrupted export ends mid deflate stream, without the gzip trailer
+    with open(path, 'wb') as f:
+        f.write(data[:len(data) * 3 // 5])
+
+    after = last_exported_position(path, 'ndjson')
+    kept = exported_ids(path, 'ndjson')
+    assert 0 < len(kept) < len(docs)
+    assert kept == ids(docs[:len(kept)])
+    assert after == f"{docs[len(kept) - 1]['createdAt']},{docs[len(kept) - 1]['_id']}"
+
+    write_export(path, iter_history(db, after=after), 'ndjson', mode='ab')
+    assert exported_ids(path, 'ndjson') == ids(docs)
+
+
+def test_resume_after_a_partial_csv_row(tmp_path):
+    docs = oldest_first(history(30))
+    db = InMemoryDatabase(detectionHistory=docs)
+    path = str(tmp_path / 'history.csv')
+    write_export(path, iter_history(db), 'csv')
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:data.rindex(b'\n', 0, len(data) // 2) + 20])
+
+    after = last_exported_position(path, 'csv')
+    write_export(path, iter_history(db, after=after), 'csv', mode='ab', header=False)
+    assert exported_ids(path, 'csv') == ids(docs)
@@ -0,0 +1,73 @@
+import math
+
+import pytest
+
+from app.geo import bbox_filter, box_ring, tile_bounds
+
+
+def to_vector(lon, lat):
+    lon, lat = math.radians(lon), math.radians(lat)
+    return math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat)
+
+
+def geodesic(a, b, samples=50):
+    """(lon, lat) points along the great circle arc from a to b"""
+    va, vb = to_vector(*a), to_vector(*b)
+    omega = math.acos(max(-1.0, min(1.0, sum(p * q for p, q in zip(va, vb)))))
+    for i in range(samples + 1):
+        t = i / samples
+        if omega == 0:
+            x, y, z = va
+        else:
+            wa, wb = math.sin((1 - t) * omega) / math.sin(omega), math.sin(t * omega) / math.sin(omega)
+            x, y, z = (wa * p + wb * q for p, q in zip(va, vb))
+        yield math.degrees(math.atan2(y, x)), math.degrees(math.asin(max(-1.0, min(1.0, z))))
+
+
+def arc_degrees(a, b):
+    va, vb = to_vector(*a), to_vector(*b)
+    return math.degrees(math.acos(max(-1.0, min(1.0, sum(p * q for p, q in zip(va, vb))))))
+
+
+def test_tile_bounds():
+    assert tile_bounds(0, 0, 0) == pytest.approx((-180, -85.0511, 180, 85.0511), abs=1e-4)
+    assert tile_bounds(1, 1, 0) == pytest.approx((0, 0, 180, 85.0511), abs=1e-4)
+    assert tile_bounds(2, 0, 3) == pytest.approx((-180, -85.0511, -90, -66.5133), abs=1e-4)
+
+
+@pytest.mark.parametrize('z, x, y', [(1, 0, 0), (1, 1, 1), (2, 1, 0), (2, 2, 3), (3, 5, 2), (12, 2893, 1868)])
+def test_box_ring_edges_stay_outside_the_tile(z, x, y):
+    min_lon, min_lat, max_lon, max_lat = tile_bounds(z, x, y)
+    ring = box_ring(min_lon, min_lat, max_lon, max_lat)
+    assert ring[0] == ring[-1]
+
+    for a, b in zip(ring, ring[1:]):
+        # Distinct, never antipodal: every segment is a well defined geodesic
+        assert 0 < arc_degrees(a, b) < 180
+        if a[1] != b[1]:
+            # Corners are joined along meridians, which are geodesics
+            assert a[0] == b[0]
+        elif a[1] < (min_lat + max_lat) / 2:
+            assert all(lat <= min_lat for lon, lat in geodesic(a, b)), (a, b)
+        else:
+            assert all(lat >= max_lat for lon, lat in geodesic(a, b)), (a, b)
+
+
+def test_points_on_tile_edges_are_matched_by_the_ranges():
+    min_lon, min_lat, max_lon, max_lat = tile_bounds(2, 2, 1)
+    match = bbox_filter(min_lon, min_lat, max_lon, max_lat)
+    for lon, lat in [(min_lon, min_lat), ((min_lon + max_lon) / 2, min_lat), (max_lon, max_lat)]:
+        assert match['geo.coordinates.0']['$gte'] <= lon <= match['geo.coordinates.0']['$lte']
+        assert match['geo.coordinates.1']['$gte'] <= lat <= match['geo.coordinates.1']['$lte']
+    assert match['geo']['$geoWithin']['$geometry']['coordinates'] == [box_ring(min_lon, min_lat, max_lon, max_lat)]
+
+
+def test_world_tile_uses_no_polygon():
+    match = bbox_filter(*tile_bounds(0, 0, 0))
+    assert 'geo' not in match
+    assert match['geo.coordinates.1']['$gte'] == pytest.approx(-85.0511, abs=1e-4)
+
+
+def test_box_touching_the_pole_collapses_its_edge():
+    ring = box_ring(10, 80, 20, 90)
+    assert [point for point in ring if point[1] == 90] == [[20 + 1e-6, 90]]
@@ -0,0 +1,73 @@
+from bson.objectid import ObjectId
+
+from app.history import archive_batch, decode_cursor, page_history, with_timestamp
+from benchmarks.in_memory_mongo import InMemoryDatabase
+
+COLD = 'detectionHistoryArchive'
+
+
+def detection(created_at, detected_class='Tomato___Early_blight'):
+    return {'_id': ObjectId(), 'createdAt': created_at, 'detected_class': detected_class, 'state': 'Punjab'}
+
+
+def all_pages(db, limit, **criteria):
+    docs, cursor, pages = [], None, 0
+    while True:
+        page, cursor = page_history(db, limit=limit, cursor=cursor, **criteria)
+        docs.extend(page)
+        pages += 1
+        if cursor is None:
+            return docs, pages
+
+
+def newest_first(docs):
+    return sorted(docs, key=lambda doc: (doc['createdAt'], doc['_id']), reverse=True)
+
+
+def test_pages_split_tied_created_at_without_skipping_or_repeating():
+    tied = '2026-10-18 12:00:00.000000'
+    docs = ([detection('2026-10-18 12:00:01.000000')] + [detection(tied) for _ in range(7)] +
+            [detection('2026-10-18 11:59:59.000000') for _ in range(2)])
+    db = InMemoryDatabase(detectionHistory=docs)
+
+    page, cursor = page_history(db, limit=3)
+    # The page ends inside the run of tied timestamps, the cursor carries the _id tiebreak
+    assert page[-1]['createdAt'] == tied
+    assert decode_cursor(cursor) == (tied, page[-1]['_id'])
+
+    paged, pages = all_pages(db, limit=3)
+    assert [doc['_id'] for doc in paged] == [doc['_id'] for doc in newest_first(docs)]
+    assert pages == 4
+
+
+def test_pages_merge_both_tiers_and_return_documents_mid_move_once():
+    tied = '2026-10-10 08:00:00.000000'
+    hot = [detection('2026-10-18 09:00:00.000000'), detection(tied), detection(tied)]
+    cold = [detection(tied), detection(tied), detection('2026-10-01 07:00:00.000000', 'Potato___Late_blight')]
+    # Copied by the archive job but not yet deleted from the hot tier
+    moving = detection(tied)
+    db = InMemoryDatabase(detectionHistory=hot + [moving], **{COLD: cold + [dict(moving)]})
+
+    paged, _ = all_pages(db, limit=2, cold_collection=COLD)
+    assert [doc['_id'] for doc in paged] == [doc['_id'] for doc in newest_first(hot + cold + [moving])]
+
+    paged, _ = all_pages(db, limit=2, cold_collection=COLD, detected_class='Potato___Late_blight')
+    assert [doc['_id'] for doc in paged] == [cold[-1]['_id']]
+    paged, _ = all_pages(db, limit=2, cold_collection=COLD, start='2026-10-10', end='2026-10-10')
+    assert len(paged) == 5
+
+
+def test_archive_batch_skips_documents_an_interrupted_run_already_copied():
+    old = [detection(f'2026-09-0{day} 10:00:00.000000') for day in range(1, 6)]
+    recent = [detection('2026-10-18 10:00:00.000000')]
+    db = InMemoryDatabase(detectionHistory=old + recent)
+    # The previous run copied the two oldest documents, then died before deleting them
+    db[COLD].insert_many([with_timestamp(dict(doc)) for doc in old[:2]])
+
+    assert archive_batch(db, '2026-10-01', COLD, batch_size=100) == 5
+    assert [doc['_id'] for doc in db.detectionHistory.find()] == [recent[0]['_id']]
+    cold_ids = [doc['_id'] for doc in db[COLD].find()]
+    assert sorted(cold_ids) == sorted(doc['_id'] for doc in old)
+    assert all(doc['ts'].year == 2026 for doc in db[COLD].find())
+    assert archive_batch(db, '2026-10-01', COLD) == 0
+
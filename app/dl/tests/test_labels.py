@@ -0,0 +1,41 @@
+import os
+
+from tools.labels import label_from_filename, labelled_images
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+CLASSES = open(os.path.join(ROOT, 'app', 'classes.txt')).read().split(',')
+
+
+def label(filename):
+    index = label_from_filename(filename, CLASSES)
+    return None if index is None else CLASSES[index]
+
+
+def test_bundled_test_images_are_all_labelled():
+    paths, targets = labelled_images(os.path.join(ROOT, 'app', 'test'), CLASSES)
+    assert len(paths) == 32
+    assert None not in targets
+    labels = {os.path.basename(path): CLASSES[target] for path, target in zip(paths, targets)}
+    assert labels['AppleScab1.JPG'] == 'Apple___Apple_scab'
+    assert labels['AppleCedarRust2.JPG'] == 'Apple___Cedar_apple_rust'
+    assert labels['CornCommonRust1.JPG'] == 'Corn_(maize)___Common_rust_'
+    assert labels['TomatoYellowCurlVirus1.JPG'] == 'Tomato___Tomato_Yellow_Leaf_Curl_Virus'
+    assert labels['PotatoHealthy1.JPG'] == 'Potato___healthy'
+
+
+def test_snake_case_names_match_too():
+    assert label('tomato_early_blight_3.jpg') == 'Tomato___Early_blight'
+
+
+def test_ambiguous_or_unknown_names_stay_unlabelled():
+    # Early blight exists for both potato and tomato
+    assert label('EarlyBlight1.jpg') is None
+    assert label('IMG_2041.jpg') is None
+
+
+def test_folder_named_after_a_class_wins(tmp_path):
+    folder = tmp_path / 'Grape___Black_rot'
+    folder.mkdir()
+    (folder / 'AppleScab1.jpg').write_bytes(b'')
+    paths, targets = labelled_images(str(tmp_path), CLASSES)
+    assert [CLASSES[target] for target in targets] == ['Grape___Black_rot']
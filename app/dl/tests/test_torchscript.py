@@ -0,0 +1,21 @@
+import torch
+
+from app.backends import TorchBackend, save_torchscript
+from app.resnet9 import ResNet9
+from tools.export_torchscript import script_model
+
+
+def test_exported_module_reloads_with_its_weights(tmp_path):
+    torch.manual_seed(0)
+    model = ResNet9(3, 38, widths=(8, 16, 16, 16)).eval()
+    example = torch.rand(1, 3, 256, 256)
+    path = str(tmp_path / 'model.pt')
+
+    save_torchscript(script_model(model, example), path, {'format': 'torchscript', 'precision': 'float32'})
+    backend = TorchBackend(path, model_format='torchscript')
+
+    xb = torch.rand(2, 3, 256, 256)
+    with torch.no_grad():
+        expected = model(xb)
+    assert backend.precision == 'float32'
+    assert torch.allclose(backend.predict_logits(xb), expected, atol=1e-4)
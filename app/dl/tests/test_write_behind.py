@@ -0,0 +1,113 @@
+import glob
+import os
+import time
+from collections import Counter
+
+from bson import json_util
+from pymongo.errors import AutoReconnect
+
+from app.analytics import apply_rollups
+from app.write_behind import WriteBehindBuffer
+from benchmarks.in_memory_mongo import InMemoryDatabase
+
+
+class FlakyCollection:
+    """detectionHistory that drops the connection after inserting `fail_after` documents of a batch"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.fail_after = None
+
+    def insert_many(self, docs, ordered=True):
+        if self.fail_after is None:
+            return self.collection.insert_many(docs, ordered=ordered)
+        for doc in docs[:self.fail_after]:
+            self.collection.insert_one(dict(doc))
+        raise AutoReconnect('connection closed')
+
+
+def detections(n, start=0):
+    return [{'detected_class': 'Tomato___Early_blight' if i % 3 else 'Potato___Late_blight',
+             'createdAt': f'2026-10-18 {i % 4:02d}:00:00.000000', 'state': 'Punjab', 'district': 'Ludhiana'}
+            for i in range(start, start + n)]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def spill_files(spill_dir):
+    return glob.glob(os.path.join(spill_dir, 'detectionHistory.*.jsonl'))
+
+
+def test_overflow_and_failed_flushes_spill_then_replay_with_rollups(tmp_path):
+    db = InMemoryDatabase()
+    history = FlakyCollection(db.detectionHistory)
+    inserted = []
+
+    def on_insert(docs):
+        inserted.extend(docs)
+        apply_rollups(db, docs)
+
+    buffer = WriteBehindBuffer(lambda: history, flush_size=5, flush_ms=60000, max_pending=5,
+                               spill_dir=str(tmp_path), on_insert=on_insert)
+    history.fail_after = 2
+    docs = detections(8)
+    buffer.add_many(docs)
+    # 3 over max_pending spill at once, the flushed 5 after 2 of them reached Mongo
+    wait_for(lambda: buffer.spilled == 8)
+    [path] = spill_files(str(tmp_path))
+    assert path.endswith(f'detectionHistory.{os.getpid()}.jsonl')
+    with open(path) as f:
+        spilled = [json_util.loads(line) for line in f]
+    assert sorted(doc['_id'] for doc in spilled) == sorted(doc['_id'] for doc in docs)
+    written_before = [doc['_id'] for doc in db.detectionHistory.docs]
+    assert len(written_before) == 2
+
+    history.fail_after = None
+    more = detections(5, start=8)
+    buffer.add_many(more)
+    wait_for(lambda: buffer.replayed == 8)
+    buffer.close()
+
+    assert spill_files(str(tmp_path)) == []
+    assert sorted(doc['_id'] for doc in db.detectionHistory.docs) == sorted(doc['_id'] for doc in docs + more)
+    # The two documents written before the failure came back as duplicates and were not counted
+    counted = [doc for doc in docs + more if doc['_id'] not in written_before]
+    assert sorted(doc['_id'] for doc in inserted) == sorted(doc['_id'] for doc in counted)
+    assert buffer.stats()['flushed'] == 5
+
+    expected = Counter((doc['createdAt'][:13], doc['detected_class']) for doc in counted)
+    counts = {(row['bucket'], row['detected_class']): row['count'] for row in db.detectionRollupHourly.docs}
+    assert counts == dict(expected)
+    assert sum(row['count'] for row in db.detectionRollupDaily.docs) == len(counted)
+
+
+def test_close_flushes_pending_documents(tmp_path):
+    # What the gunicorn worker_exit hook relies on
+    db = InMemoryDatabase()
+    buffer = WriteBehindBuffer(lambda: db.detectionHistory, flush_size=100, flush_ms=60000,
+                               spill_dir=str(tmp_path))
+    buffer.add_many(detections(3))
+    assert db.detectionHistory.docs == []
+    buffer.close()
+    assert len(db.detectionHistory.docs) == 3
+    assert buffer.stats()['pending'] == 0
+
+    # Late writes after close go straight to Mongo
+    buffer.add(detections(1)[0])
+    assert len(db.detectionHistory.docs) == 4
+    assert spill_files(str(tmp_path)) == []
+
+
+def test_disabled_buffer_inserts_synchronously():
+    db = InMemoryDatabase()
+    seen = []
+    buffer = WriteBehindBuffer(lambda: db.detectionHistory, enabled=False, on_insert=seen.extend)
+    docs = detections(2)
+    buffer.add_many(docs)
+    assert [doc['_id'] for doc in db.detectionHistory.docs] == [doc['_id'] for doc in docs]
+    assert seen == docs
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Move old detection history out of the hot collection
+Records older than --days (DL_HISTORY_ARCHIVE_DAYS) are copied to the cold
+collection (DL_HISTORY_COLD_COLLECTION) in batches and deleted from
+detectionHistory, so the hot working set stays small. /api/dl/history keeps
+serving them from the cold tier. Safe to interrupt and re-run; schedule it daily.
+
+--timeseries creates the cold collection as a MongoDB time-series collection
+(5.0+), which stores the archived records compressed. --to-file writes them
+to a gzipped NDJSON file instead; those records leave the read API.
+
+Usage (from app/dl, MONGO_URI as for the service):
+    python -m tools.archive_history [--days 90] [--timeseries] [--to-file archive.ndjson.gz]
+"""
+import argparse
+import gzip
+import sys
+from datetime import datetime, timedelta
+
+from bson import json_util
+from pymongo import ASCENDING, MongoClient
+from pymongo.errors import PyMongoError
+
+from app import config
+from app.history import COLD_INDEXES, HOT_COLLECTION, archive_batch
+
+
+def create_cold_collection(db, name, timeseries):
+    if name in db.list_collection_names():
+        return
+    if timeseries:
+        db.create_collection(name, timeseries={'timeField': 'ts', 'metaField': 'detected_class',
+                                               'granularity': 'hours'})
+    else:
+        db.create_collection(name)
+    try:
+        db[name].create_indexes(COLD_INDEXES)
+    except PyMongoError as ex:
+        # Secondary indexes on time-series measurements need MongoDB 6.0
+        print(f"Could not index {name}, cold reads will scan it: {ex}")
+
+
+def archive_to_file(db, cutoff, path, batch_size):
+    hot = db[HOT_COLLECTION]
+    moved = 0
+    with gzip.open(path, 'at') as f:
+        while True:
+            docs = list(hot.find({'createdAt': {'$lt': cutoff}}).sort('createdAt', ASCENDING).limit(batch_size))
+            if not docs:
+                return moved
+            for doc in docs:
+                f.write(json_util.dumps(doc) + '\n')
+            f.flush()
+            hot.delete_many({'_id': {'$in': [doc['_id'] for doc in docs]}})
+            moved += len(docs)
+            print(f"Archived {moved} records to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=config.HISTORY_ARCHIVE_DAYS)
+    parser.add_argument('--collection', default=config.HISTORY_COLD_COLLECTION, help='cold collection')
+    parser.add_argument('--timeseries', action='store_true',
+                        help='create the cold collection as a time-series collection')
+    parser.add_argument('--to-file', help='append to this gzipped NDJSON file instead of a cold collection')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    db = MongoClient(config.MONGO_URI).get_default_database()
+    # createdAt is str(datetime), compare against the same format
+    cutoff = str(datetime.now() - timedelta(days=args.days))
+    print(f"Archiving records created before {cutoff}")
+
+    if args.to_file:
+        moved = archive_to_file(db, cutoff, args.to_file, args.batch_size)
+    else:
+        if not args.collection:
+            parser.error('no cold collection configured, pass --collection or --to-file')
+        create_cold_collection(db, args.collection, args.timeseries)
+        moved = 0
+        while True:
+            batch = archive_batch(db, cutoff, args.collection, args.batch_size)
+            if not batch:
+                break
+            moved += batch
+            print(f"Archived {moved} records to {args.collection}")
+    print(f"Done, {moved} records archived")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
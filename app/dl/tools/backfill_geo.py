@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Add the GeoJSON `geo` point to detectionHistory documents written before it existed
+Computed server side from location.lat/lon (longitude wrapped to [-180, 180)) in
+one update per batch of _ids, so it can run against a live database.
+
+Usage (from app/dl, MONGO_URI as for the service):
+    python -m tools.backfill_geo [--batch-size 5000]
+"""
+import argparse
+import sys
+
+from pymongo import MongoClient
+
+from app import config
+
+# Same as app.geo.geo_point, as an aggregation expression
+GEO_POINT = {
+    'type': 'Point',
+    'coordinates': [
+        {'$subtract': [{'$mod': [{'$add': [{'$mod': [{'$add': ['$location.lon', 180]}, 360]}, 360]}, 360]}, 180]},
+        '$location.lat',
+    ],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    history = MongoClient(config.MONGO_URI).get_default_database().detectionHistory
+    pending = {'geo': {'$exists': False},
+               'location.lat': {'$type': 'number', '$gte': -90, '$lte': 90},
+               'location.lon': {'$type': 'number'}}
+    total = 0
+    while True:
+        ids = [doc['_id'] for doc in history.find(pending, {'_id': 1}).limit(args.batch_size)]
+        if not ids:
+            break
+        result = history.update_many({'_id': {'$in': ids}}, [{'$set': {'geo': GEO_POINT}}])
+        total += result.modified_count
+        print(f"Backfilled {total} documents")
+    print(f"Done, {total} documents updated, "
+          f"{history.count_documents({'geo': {'$exists': False}})} still without a location")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
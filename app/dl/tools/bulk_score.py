@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Offline bulk scorer for archived field images
+Walks a directory tree, decodes images in DataLoader worker processes, runs
+batched inference and streams one result per image to JSONL or CSV.
+Re-running with --resume skips images already present in the output.
+
+Usage (from app/dl):
+    python -m tools.bulk_score IMAGE_DIR --output scores.jsonl [--workers 4] [--batch-size 64] [--resume]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+from app.preprocessing import IMAGE_SIZE, preprocess_image
+from app.resnet import ResNet
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+CSV_FIELDS = ['path', 'label', 'confidence', 'model', 'error']
+
+
+def walk_images(root, extensions=IMAGE_EXTENSIONS):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(extensions):
+                yield os.path.join(dirpath, filename)
+
+
+class ImagePathDataset(Dataset):
+    """Decodes images by path, reporting failures instead of raising so one bad file can't stop a run"""
+
+    def __init__(self, paths, dtype):
+        self.paths = paths
+        self.dtype = dtype
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        start = time.perf_counter()
+        try:
+            tensor, error = preprocess_image(self.paths[index], dtype=self.dtype), ''
+        except Exception as ex:
+            tensor, error = torch.zeros(3, IMAGE_SIZE, IMAGE_SIZE, dtype=self.dtype), f'{type(ex).__name__}: {ex}'
+        return tensor, self.paths[index], error, time.perf_counter() - start
+
+
+def truncate_partial_line(path):
+    """Drop a trailing line left half-written by an interrupted run"""
+    with open(path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end != len(data):
+            f.truncate(end)
+
+
+def completed_paths(path, fmt):
+    if not os.path.exists(path):
+        return set()
+    truncate_partial_line(path)
+    with open(path, newline='') as f:
+        if fmt == 'csv':
+            return {row['path'] for row in csv.DictReader(f)}
+        return {json.loads(line)['path'] for line in f if line.strip()}
+
+
+class ResultWriter:
+    def __init__(self, path, fmt, append):
+        exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, 'a' if append else 'w', newline='')
+        self.fmt = fmt
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(self.file, fieldnames=CSV_FIELDS)
+            if not exists:
+                self.csv.writeheader()
+
+    def write(self, row):
+        if self.fmt == 'csv':
+            self.csv.writerow(row)
+        else:
+            self.file.write(json.dumps({k: v for k, v in row.items() if v != ''}) + '\n')
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('root', help='directory tree of images to score')
+    parser.add_argument('--output', required=True, help='.jsonl or .csv file to write')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help='defaults to the output extension')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help='decoding processes')
+    parser.add_argument('--resume', action='store_true', help='append to --output, skipping images already scored')
+    args = parser.parse_args()
+    fmt = args.format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+
+    resnet = ResNet()
+    done = completed_paths(args.output, fmt) if args.resume else set()
+    paths = [path for path in walk_images(args.root) if path not in done]
+    print(f"{len(paths)} images to score under {args.root} ({len(done)} already done), model {resnet.model_id}")
+    if not paths:
+        return 0
+
+    loader = DataLoader(ImagePathDataset(paths, resnet.dtype), batch_size=args.batch_size,
+                        num_workers=args.workers, pin_memory=False)
+    writer = ResultWriter(args.output, fmt, append=args.resume)
+
+    scored = failed = 0
+    decode_time = wait_time = forward_time = write_time = 0.0
+    start = last = time.perf_counter()
+    try:
+        for xb, batch_paths, errors, decode_seconds in loader:
+            t0 = time.perf_counter()
+            wait_time += t0 - last
+            decode_time += float(decode_seconds.sum())
+            results = resnet.predict_results(xb)
+            t1 = time.perf_counter()
+            for path, error, result in zip(batch_paths, errors, results):
+                if error:
+                    failed += 1
+                    writer.write({'path': path, 'label': '', 'confidence': '', 'model': resnet.model_id, 'error': error})
+                else:
+                    writer.write({'path': path, 'label': result['label'], 'confidence': max(result['probabilities']),
+                                  'model': resnet.model_id, 'error': ''})
+            writer.flush()
+            last = time.perf_counter()
+            forward_time += t1 - t0
+            write_time += last - t1
+            scored += len(batch_paths)
+            elapsed = last - start
+            print(f"\r{scored}/{len(paths)} images  {scored / elapsed:.1f} img/s  {failed} failed", end='', flush=True)
+    finally:
+        writer.close()
+        print()
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {scored} images in {elapsed:.1f}s ({scored / elapsed:.1f} img/s), {failed} failed")
+    print(f"  decode  {decode_time:8.1f}s cpu across {args.workers} workers ({decode_time / max(scored, 1) * 1000:.1f}ms/img)")
+    print(f"  waiting {wait_time:8.1f}s on decode workers")
+    print(f"  forward {forward_time:8.1f}s ({forward_time / max(scored, 1) * 1000:.1f}ms/img)")
+    print(f"  write   {write_time:8.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
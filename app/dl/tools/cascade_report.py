@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Cascade report: compute saved and accuracy impact of the early-exit head
+For each confidence threshold, reports how many test images exit after res1,
+the average multiply-accumulates saved per image, agreement with the full
+model and accuracy of both, on images labelled by folder or file name (see
+tools/labels.py). An exit after res1 still pays for stage 1, so the saving is
+bounded by stage 2's share of the compute.
+
+Usage (from app/dl):
+    python -m tools.cascade_report --head app/ResNet/early-exit-head.pth [--data app/test]
+"""
+import argparse
+import json
+import sys
+
+import torch
+import torch.nn as nn
+
+from app.preprocessing import IMAGE_SIZE
+from app.resnet import ResNet
+from app.resnet9 import EarlyExitHead
+from tools.labels import labelled_images
+
+
+def count_macs(fn, modules, x):
+    """Multiply-accumulates of the Conv2d/Linear layers in `modules` while running fn(x)"""
+    total = [0]
+
+    def hook(module, inputs, output):
+        if isinstance(module, nn.Conv2d):
+            kh, kw = module.kernel_size
+            total[0] += output[0].numel() * module.in_channels // module.groups * kh * kw
+        elif isinstance(module, nn.Linear):
+            total[0] += module.in_features * module.out_features
+
+    handles = [m.register_forward_hook(hook) for root in modules for m in root.modules()
+               if isinstance(m, (nn.Conv2d, nn.Linear))]
+    with torch.no_grad():
+        out = fn(x)
+    for handle in handles:
+        handle.remove()
+    return total[0], out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--head', required=True, help='early-exit head written by tools/train_early_exit.py')
+    parser.add_argument('--data', default='app/test')
+    parser.add_argument('--thresholds', default='0.5,0.7,0.8,0.9,0.95,0.99')
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--output', help='also write the report as JSON')
+    args = parser.parse_args()
+
+    resnet = ResNet(precision='float32', model_format='state_dict', backend='torch', cascade_head_path=None)
+    model = resnet.model
+    head = EarlyExitHead(model.widths[1], len(resnet.classes))
+    head.load_state_dict(torch.load(args.head, map_location=torch.device('cpu')))
+    head.eval()
+
+    x = torch.rand(1, 3, IMAGE_SIZE, IMAGE_SIZE)
+    stage1_macs, features = count_macs(model.forward_stage1, [model.conv1, model.conv2, model.res1], x)
+    stage2_macs, _ = count_macs(model.forward_stage2, [model.conv3, model.conv4, model.res2, model.classifier], features)
+    head_macs, _ = count_macs(head, [head], features)
+    full_macs = stage1_macs + stage2_macs
+    print(f"MACs per image: stage 1 {stage1_macs / 1e9:.2f}G ({stage1_macs / full_macs:.0%})  "
+          f"stage 2 {stage2_macs / 1e9:.2f}G ({stage2_macs / full_macs:.0%})  head {head_macs / 1e3:.1f}K, "
+          f"an early exit saves at most {(stage2_macs - head_macs) / full_macs:.1%}")
+
+    paths, labels = labelled_images(args.data, resnet.classes)
+    if not paths:
+        print(f"No images found under {args.data}")
+        return 1
+    targets = torch.tensor([-1 if label is None else label for label in labels])
+    head_probs, full_preds = [], []
+    with torch.no_grad():
+        for i in range(0, len(paths), args.batch_size):
+            xb = torch.stack([resnet.preprocess(path) for path in paths[i:i + args.batch_size]])
+            stage1 = model.forward_stage1(xb)
+            head_probs.append(torch.softmax(head(stage1), dim=1))
+            full_preds.append(model.forward_stage2(stage1).argmax(dim=1))
+    head_probs, full_preds = torch.cat(head_probs), torch.cat(full_preds)
+    confidence, head_preds = head_probs.max(dim=1)
+    labelled = targets >= 0
+
+    def accuracy(preds):
+        return (preds[labelled] == targets[labelled]).float().mean().item() if labelled.any() else None
+
+    full_accuracy = accuracy(full_preds)
+    rows = []
+    print(f"{len(paths)} images from {args.data}, {int(labelled.sum())} labelled" +
+          ('' if full_accuracy is None else f", full model accuracy {full_accuracy:.4f}"))
+    print(f"{'threshold':>9s} {'early exit':>10s} {'MACs saved':>10s} {'agreement':>9s} {'accuracy':>8s} {'delta':>7s}")
+    for threshold in (float(t) for t in args.thresholds.split(',')):
+        early = confidence >= threshold
+        preds = torch.where(early, head_preds, full_preds)
+        exit_rate = early.float().mean().item()
+        saved = (exit_rate * stage2_macs - head_macs) / full_macs
+        agreement = (preds == full_preds).float().mean().item()
+        cascade_accuracy = accuracy(preds)
+        rows.append({'threshold': threshold, 'earlyExitRate': exit_rate, 'macsSaved': saved,
+                     'agreement': agreement, 'accuracy': cascade_accuracy, 'fullAccuracy': full_accuracy})
+        acc = '     n/a        ' if cascade_accuracy is None else \
+            f"{cascade_accuracy:8.4f} {cascade_accuracy - full_accuracy:+7.4f}"
+        print(f"{threshold:9.2f} {exit_rate:10.1%} {saved:10.1%} {agreement:9.4f} {acc}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'head': args.head, 'data': args.data, 'images': len(paths), 'labelled': int(labelled.sum()),
+                       'stage1Macs': stage1_macs, 'stage2Macs': stage2_macs, 'headMacs': head_macs,
+                       'thresholds': rows}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Precision parity check for the ResNet9 model
+Compares the top-1 class of every inference precision against the float64
+reference on an ImageFolder (defaults to the bundled app/test images)
+
+Usage (from app/dl):
+    python -m tools.check_precision [--data app/test] [--min-agreement 0.99]
+"""
+import argparse
+import sys
+import time
+
+import torch
+from torchvision.datasets import ImageFolder
+
+from app.backends import PRECISIONS, resolve_precision
+from app.resnet import ResNet
+
+
+def predict_folder(resnet, paths, batch_size):
+    preds, logits = [], []
+    start = time.perf_counter()
+    for i in range(0, len(paths), batch_size):
+        xb = torch.stack([resnet.preprocess(path) for path in paths[i:i + batch_size]])
+        yb = resnet.predict_logits(xb)
+        logits.append(yb)
+        preds.extend(torch.argmax(yb, dim=1).tolist())
+    elapsed = time.perf_counter() - start
+    return preds, torch.cat(logits), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='app/test', help='ImageFolder root to score')
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--min-agreement', type=float, default=0.99,
+                        help='fail if a mode agrees with float64 on fewer images than this')
+    args = parser.parse_args()
+
+    paths = [path for path, _ in ImageFolder(args.data).samples]
+    if not paths:
+        print(f"No images found under {args.data}")
+        return 1
+    print(f"Scoring {len(paths)} images from {args.data}")
+
+    reference = ResNet(precision='float64', model_format='state_dict',
+                       backend='torch', cascade_head_path=None)
+    ref_preds, ref_logits, ref_time = predict_folder(reference, paths, args.batch_size)
+    print(f"float64   reference  {ref_time:.2f}s")
+
+    failed = False
+    for precision in PRECISIONS:
+        if precision == 'float64':
+            continue
+        if resolve_precision(precision) != precision:
+            print(f"{precision:9s} skipped (not supported on this CPU)")
+            continue
+        resnet = ResNet(precision=precision, model_format='state_dict',
+                        backend='torch', cascade_head_path=None)
+        preds, logits, elapsed = predict_folder(resnet, paths, args.batch_size)
+        agreement = sum(a == b for a, b in zip(preds, ref_preds)) / len(paths)
+        max_diff = (logits - ref_logits).abs().max().item()
+        status = 'OK' if agreement >= args.min_agreement else 'FAIL'
+        failed = failed or status == 'FAIL'
+        print(f"{precision:9s} top-1 agreement {agreement:.4f}  max |logit diff| {max_diff:.4f}  "
+              f"{elapsed:.2f}s ({ref_time / elapsed:.2f}x)  {status}")
+        for path, a, b in zip(paths, preds, ref_preds):
+            if a != b:
+                print(f"    {path}: {resnet.classes[a]} != {reference.classes[b]}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Prune and distill ResNet9 into a slimmer model
+Filters are ranked by the L1 norm of their weights and the weakest are
+removed, keeping --ratio of every layer's channels. Channels joined by a
+residual connection (conv2/res1 and conv4/res2/classifier) are pruned
+together so the skip additions still line up. The pruned student is then
+fine-tuned against the full model with knowledge distillation, so any
+folder of leaf images works; images labelled by folder or file name (see
+tools/labels.py) add the true labels to the loss. The report gives accuracy
+on the labelled --val images next to agreement with the full model, so a
+prune that breaks the model shows up as an accuracy drop.
+
+The result is a checkpoint that loads through DL_MODEL_PATH with the
+default state_dict format, and can be exported or quantized like the original.
+
+Usage (from app/dl):
+    python -m tools.compress --data TRAIN_IMAGES [--val app/test] [--ratio 0.5] [--epochs 5]
+"""
+import argparse
+import json
+import os
+import sys
+
+import torch
+from torch.utils.data import DataLoader
+
+from app.preprocessing import IMAGE_SIZE
+from app.resnet import ResNet
+from app.resnet9 import ResNet9, save_resnet9
+from tools.bulk_score import ImagePathDataset
+from tools.cascade_report import count_macs
+from tools.labels import labelled_images
+
+
+def conv_bn(block):
+    """The Conv2d and BatchNorm2d of a ConvBlock"""
+    return block[0], block[1]
+
+
+def filter_scores(blocks):
+    """L1 norm of every output filter, summed over blocks whose outputs are added together"""
+    return sum(conv_bn(block)[0].weight.detach().abs().sum(dim=(1, 2, 3)) for block in blocks)
+
+
+def keep_indices(scores, ratio):
+    """Indices of the strongest max(1, ratio * n) filters, in their original order"""
+    keep = max(1, int(round(len(scores) * ratio)))
+    return torch.sort(torch.topk(scores, keep).indices).values
+
+
+def copy_block(source, target, in_idx, out_idx):
+    src_conv, src_bn = conv_bn(source)
+    dst_conv, dst_bn = conv_bn(target)
+    dst_conv.weight.copy_(src_conv.weight[out_idx][:, in_idx])
+    dst_conv.bias.copy_(src_conv.bias[out_idx])
+    for name in ('weight', 'bias', 'running_mean', 'running_var'):
+        getattr(dst_bn, name).copy_(getattr(src_bn, name)[out_idx])
+
+
+def prune_resnet9(model, ratio):
+    """A ResNet9 keeping `ratio` of the filters of `model`, with the surviving weights copied over"""
+    # The inner conv of each residual block is pruned on its own; with one ratio
+    # for every layer it keeps as many filters as the block it sits in.
+    idx1 = keep_indices(filter_scores([model.conv1]), ratio)
+    idx2 = keep_indices(filter_scores([model.conv2, model.res1[1]]), ratio)
+    idx_res1 = keep_indices(filter_scores([model.res1[0]]), ratio)
+    idx3 = keep_indices(filter_scores([model.conv3]), ratio)
+    idx4 = keep_indices(filter_scores([model.conv4, model.res2[1]]), ratio)
+    idx_res2 = keep_indices(filter_scores([model.res2[0]]), ratio)
+    all_inputs = torch.arange(model.conv1[0].in_channels)
+
+    linear = model.classifier[-1]
+    student = ResNet9(model.conv1[0].in_channels, linear.out_features,
+                      widths=(len(idx1), len(idx2), len(idx3), len(idx4)))
+    with torch.no_grad():
+        copy_block(model.conv1, student.conv1, all_inputs, idx1)
+        copy_block(model.conv2, student.conv2, idx1, idx2)
+        copy_block(model.res1[0], student.res1[0], idx2, idx_res1)
+        copy_block(model.res1[1], student.res1[1], idx_res1, idx2)
+        copy_block(model.conv3, student.conv3, idx2, idx3)
+        copy_block(model.conv4, student.conv4, idx3, idx4)
+        copy_block(model.res2[0], student.res2[0], idx4, idx_res2)
+        copy_block(model.res2[1], student.res2[1], idx_res2, idx4)
+        student.classifier[-1].weight.copy_(linear.weight[:, idx4])
+        student.classifier[-1].bias.copy_(linear.bias)
+    return student
+
+
+def count_params(model):
+    return sum(p.numel() for p in model.parameters())
+
+
+def model_macs(model):
+    macs, _ = count_macs(model, [model], torch.rand(1, 3, IMAGE_SIZE, IMAGE_SIZE))
+    return macs
+
+
+def image_loader(images, batch_size, workers, shuffle=False):
+    """(images, labels) batches of labelled_images() output, -1 for unlabelled images"""
+    paths, targets = images
+    labels = {path: -1 if target is None else target for path, target in zip(paths, targets)}
+    loader = DataLoader(ImagePathDataset(paths, torch.float32),
+                        batch_size=batch_size, num_workers=workers, shuffle=shuffle)
+    for xb, paths, errors, _ in loader:
+        keep = [i for i, error in enumerate(errors) if not error]
+        if keep:
+            yield xb[keep], torch.tensor([labels[paths[i]] for i in keep])
+
+
+@torch.no_grad()
+def evaluate(model, teacher, batches):
+    """validation_step over the labelled images, plus top-1 agreement with the teacher on all of them"""
+    model.eval()
+    outputs, agree, total = [], 0, 0
+    for xb, labels in batches:
+        preds = model(xb).argmax(dim=1)
+        agree += (preds == teacher(xb).argmax(dim=1)).sum().item()
+        total += len(xb)
+        labelled = labels >= 0
+        if labelled.any():
+            outputs.append(model.validation_step((xb[labelled], labels[labelled])))
+    result = {'agreement': agree / total if total else 0.0, 'val_loss': None, 'val_accuracy': None}
+    if outputs:
+        result.update({k: v.item() for k, v in model.validation_epoch_end(outputs).items()})
+    return result
+
+
+def describe(result):
+    accuracy = 'n/a (no labelled images)' if result['val_accuracy'] is None else f"{result['val_accuracy']:.4f}"
+    return f"accuracy {accuracy}, agreement with full model {result['agreement']:.4f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', required=True, help='folder of fine-tuning images')
+    parser.add_argument('--val', default='app/test', help='folder of images used for the before/after report')
+    parser.add_argument('--output', default=os.path.join('app', 'ResNet', 'plant-disease-model-pruned.pth'))
+    parser.add_argument('--ratio', type=float, default=0.5, help='fraction of filters kept in every layer')
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--lr', type=float, default=1e-3)
+    parser.add_argument('--temperature', type=float, default=4.0)
+    parser.add_argument('--alpha', type=float, default=0.7, help='weight of the distillation loss')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--report', help='also write the before/after report as JSON')
+    args = parser.parse_args()
+    if not 0 < args.ratio <= 1:
+        parser.error('--ratio must be in (0, 1]')
+
+    resnet = ResNet(precision='float32', model_format='state_dict', backend='torch', cascade_head_path=None)
+    teacher = resnet.model
+    train_set = labelled_images(args.data, resnet.classes)
+    val_set = labelled_images(args.val, resnet.classes)
+    for name, (paths, targets) in (('--data', train_set), ('--val', val_set)):
+        print(f"{name}: {len(paths)} images, {sum(t is not None for t in targets)} labelled")
+
+    def val_batches():
+        return image_loader(val_set, args.batch_size, args.workers)
+
+    student = prune_resnet9(teacher, args.ratio)
+    report = {
+        'ratio': args.ratio,
+        'widths': {'before': list(teacher.widths), 'after': list(student.widths)},
+        'params': {'before': count_params(teacher), 'after': count_params(student)},
+        'macs': {'before': model_macs(teacher), 'after': model_macs(student)},
+        'teacher': evaluate(teacher, teacher, val_batches()),
+        'pruned': evaluate(student, teacher, val_batches()),
+    }
+    print(f"Widths {report['widths']['before']} -> {report['widths']['after']}, "
+          f"params {report['params']['before'] / 1e6:.2f}M -> {report['params']['after'] / 1e6:.2f}M, "
+          f"MACs {report['macs']['before'] / 1e9:.2f}G -> {report['macs']['after'] / 1e9:.2f}G")
+    print(f"Full model: {describe(report['teacher'])}")
+    print(f"Before fine-tuning: {describe(report['pruned'])}")
+
+    optimizer = torch.optim.Adam(student.parameters(), lr=args.lr)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, max(1, args.epochs))
+    for epoch in range(args.epochs):
+        student.train()
+        losses, lrs = [], []
+        for xb, labels in image_loader(train_set, args.batch_size, args.workers, shuffle=True):
+            loss = student.distillation_step((xb, labels), teacher, temperature=args.temperature, alpha=args.alpha)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            losses.append(loss.item())
+            lrs.append(optimizer.param_groups[0]['lr'])
+        scheduler.step()
+        result = evaluate(student, teacher, val_batches())
+        if result['val_accuracy'] is not None:
+            student.epoch_end(epoch, dict(result, lrs=lrs or [args.lr],
+                                          train_loss=sum(losses) / max(1, len(losses))))
+        print(f"Epoch [{epoch}], {describe(result)}")
+    report['distilled'] = evaluate(student, teacher, val_batches())
+    print(f"After fine-tuning: {describe(report['distilled'])}")
+
+    save_resnet9(student, args.output)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}, serve it with DL_MODEL_PATH={args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Query plan check for the fasal database
+Runs explain on every query shape in app.indexes.QUERIES and flags the ones
+whose winning plan is a collection scan. Exits non-zero when an unexpected
+collection scan is found, so it can run after deploys or in CI.
+
+Usage (from app/dl, MONGO_URI as for the service):
+    python -m tools.explain_queries [--ensure-indexes] [--execution] [--output plans.json]
+"""
+import argparse
+import json
+import sys
+
+from pymongo import MongoClient
+
+from app import config
+from app.indexes import QUERIES, ensure_indexes
+
+
+def plan_stages(plan):
+    """All stage names of a (winning) plan tree, root first"""
+    stages = [plan.get('stage')]
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            stages.extend(plan_stages(plan[key]))
+    for child in plan.get('inputStages', []):
+        stages.extend(plan_stages(child))
+    return stages
+
+
+def explain(db, collection, query, sort, execution):
+    command = {'find': collection, 'filter': query}
+    if sort:
+        command['sort'] = dict(sort)
+    result = db.command('explain', command, verbosity='executionStats' if execution else 'queryPlanner')
+    winning = result['queryPlanner']['winningPlan']
+    stages = plan_stages(winning)
+    row = {'stages': stages, 'collectionScan': 'COLLSCAN' in stages,
+           'index': next(_index_names(winning), None)}
+    if execution:
+        stats = result['executionStats']
+        row.update({'nReturned': stats['nReturned'], 'keysExamined': stats['totalKeysExamined'],
+                    'docsExamined': stats['totalDocsExamined'], 'millis': stats['executionTimeMillis']})
+    return row
+
+
+def _index_names(plan):
+    if 'indexName' in plan:
+        yield plan['indexName']
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            yield from _index_names(plan[key])
+    for child in plan.get('inputStages', []):
+        yield from _index_names(child)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ensure-indexes', action='store_true', help='create the app indexes first')
+    parser.add_argument('--execution', action='store_true',
+                        help='run the queries (executionStats) instead of only planning them')
+    parser.add_argument('--output', help='also write the plans as JSON')
+    args = parser.parse_args()
+
+    db = MongoClient(config.MONGO_URI).get_default_database()
+    if args.ensure_indexes:
+        ensure_indexes(db)
+
+    report, unexpected = [], 0
+    for description, collection, query, sort, scan_expected in QUERIES:
+        row = explain(db, collection, query, sort, args.execution)
+        row.update({'query': description, 'collection': collection, 'scanExpected': scan_expected})
+        flag = ''
+        if row['collectionScan']:
+            flag = 'COLLSCAN (expected)' if scan_expected else 'COLLSCAN'
+            unexpected += not scan_expected
+        detail = f"  examined {row['docsExamined']} docs for {row['nReturned']}" if args.execution else ''
+        print(f"{description:48s} {collection:18s} {row['index'] or '-':26s} {flag}{detail}")
+        report.append(row)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+    print(f"\n{unexpected} unexpected collection scan(s)")
+    return 1 if unexpected else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
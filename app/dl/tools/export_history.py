@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Export detection history to NDJSON or CSV, optionally gzipped
+Streams from batched cursors over the hot and archived tiers in (createdAt, _id)
+order, with constant memory. --resume continues an interrupted export: it reads
+the createdAt and _id of the last row already in the output file, drops
+whatever an interruption left after it and appends from there (a gzip file
+gets a new member, which gzip readers concatenate transparently).
+
+Usage (from app/dl, MONGO_URI as for the service):
+    python -m tools.export_history --output history.ndjson.gz [--format csv] [--from 2026-01-01] [--to 2026-06-30]
+        [--class Tomato___Early_blight] [--resume | --after CREATED_AT,ID]
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+
+from pymongo import MongoClient
+
+from app import config
+from app.export import FORMATS, encode_bytes, encode_rows, iter_history
+
+
+def last_exported_position(path, fmt):
+    """
+    "<createdAt>,<_id>" of the last complete row of an existing export, read in
+    one streaming pass. Anything after that row (a partial line, or the
+    unterminated deflate stream an interrupted gzip export ends with) is cut
+    by cut_export so the resumed rows follow it cleanly.
+    """
+    compressed = path.endswith('.gz')
+    last, offset, clean = None, 0, False
+    try:
+        with (gzip.open if compressed else open)(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                text = line.decode('utf-8')
+                if fmt == 'csv':
+                    row = next(csv.reader([text]))
+                    last = f'{row[1]},{row[0]}' if row[0] != '_id' else last
+                else:
+                    doc = json.loads(text)
+                    last = f"{doc['createdAt']},{doc['_id']['$oid']}"
+                offset += len(line)
+            else:
+                clean = True
+    except (EOFError, OSError, ValueError, KeyError, IndexError) as ex:
+        print(f"Stopped reading {path} at a damaged row: {ex!r}", file=sys.stderr)
+    if not clean:
+        cut_export(path, offset)
+    return last
+
+
+def cut_export(path, length):
+    """
+    Keep the first `length` (uncompressed) bytes of an export. A gzip file can't
+    be cut in place, appending a member after a broken one leaves the whole file
+    unreadable, so its valid prefix is recompressed into a new file that replaces it.
+    """
+    if not path.endswith('.gz'):
+        with open(path, 'r+b') as f:
+            f.truncate(length)
+        return
+    print(f"Rewriting the first {length} bytes of {path} without its damaged tail", file=sys.stderr)
+    partial = path + '.partial'
+    with gzip.open(path, 'rb') as src, gzip.open(partial, 'wb') as dst:
+        while length:
+            chunk = src.read(min(length, 1024 * 1024))
+            if not chunk:
+                break
+            dst.write(chunk)
+            length -= len(chunk)
+    os.replace(partial, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='output file, "-" or omitted for stdout; a .gz suffix gzips it')
+    parser.add_argument('--format', choices=FORMATS, default='ndjson')
+    parser.add_argument('--from', dest='start', help='first day ("2026-01-01")')
+    parser.add_argument('--to', dest='end', help='last day, inclusive')
+    parser.add_argument('--class', dest='detected_class')
+    parser.add_argument('--state')
+    parser.add_argument('--after', help='only export detections after this "<createdAt>,<_id>" position')
+    parser.add_argument('--resume', action='store_true', help='continue after the last row of --output')
+    parser.add_argument('--hot-only', action='store_true', help='skip the archived tier')
+    args = parser.parse_args()
+
+    to_stdout = args.output in (None, '-')
+    compress = not to_stdout and args.output.endswith('.gz')
+    after = args.after
+    if args.resume:
+        if to_stdout:
+            parser.error('--resume needs --output')
+        if os.path.exists(args.output):
+            after = last_exported_position(args.output, args.format)
+            print(f"Resuming after {after}", file=sys.stderr)
+
+    db = MongoClient(config.MONGO_URI).get_default_database()
+    docs = iter_history(db, after=after, cold_collection=None if args.hot_only else config.HISTORY_COLD_COLLECTION,
+                        batch_size=config.EXPORT_BATCH_SIZE, detected_class=args.detected_class, state=args.state,
+                        start=args.start, end=args.end)
+    rows = 0
+
+    def counted(docs):
+        nonlocal rows
+        for doc in docs:
+            rows += 1
+            yield doc
+
+    body = encode_bytes(encode_rows(counted(docs), args.format, header=after is None), compress=compress)
+    out = sys.stdout.buffer if to_stdout else open(args.output, 'ab' if after else 'wb')
+    try:
+        for chunk in body:
+            out.write(chunk)
+    finally:
+        out.flush()
+        if not to_stdout:
+            out.close()
+    print(f"Exported {rows} detections", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Export ResNet9 to ONNX with a dynamic batch axis
+Verifies the exported graph against the PyTorch model with ONNX Runtime and
+compares their latency
+
+Serve the result with DL_BACKEND=onnx DL_MODEL_PATH=<output>. ONNX Runtime is
+an optional dependency: pip install -r requirements-onnx.txt
+
+Usage (from app/dl):
+    python -m tools.export_onnx [--opset 12]
+"""
+import argparse
+import os
+import sys
+import time
+
+import torch
+
+from app import config
+from app.resnet import ResNet
+
+
+def time_backend(resnet, xb, repeat):
+    resnet.predict_logits(xb)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        resnet.predict_logits(xb)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=config.MODEL_PATH, help='float state dict to export')
+    parser.add_argument('--output', default=os.path.join('app', 'ResNet', 'plant-disease-model.onnx'))
+    parser.add_argument('--opset', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=10, help='timed forward passes per batch size')
+    args = parser.parse_args()
+
+    eager = ResNet(precision='float32', model_path=args.model, model_format='state_dict',
+                   backend='torch', cascade_head_path=None)
+    example = torch.rand(1, 3, 256, 256)
+    torch.onnx.export(eager.model, example, args.output,
+                      input_names=['input'], output_names=['logits'],
+                      dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+                      opset_version=args.opset, do_constant_folding=True)
+    print(f"Wrote {args.output}")
+
+    onnx = ResNet(model_path=args.output, backend='onnx')
+    for batch_size in (1, 4, 16):
+        xb = torch.rand(batch_size, 3, 256, 256)
+        max_diff = (onnx.predict_logits(xb) - eager.predict_logits(xb)).abs().max().item()
+        torch_time = time_backend(eager, xb, args.repeat)
+        onnx_time = time_backend(onnx, xb, args.repeat)
+        print(f"batch {batch_size:2d}  torch {torch_time * 1000:7.1f}ms  onnx {onnx_time * 1000:7.1f}ms "
+              f"({torch_time / onnx_time:.2f}x)  max |logit diff| {max_diff:.6f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
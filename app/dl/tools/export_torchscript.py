@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Export ResNet9 as a traced, frozen TorchScript module
+The artifact loads with torch.jit.load alone, so serving workers skip building
+the model in Python and the eager first forward pass. Freezing folds the
+BatchNorms into the convolutions; the MKLDNN rewrites of optimize_for_inference
+can't be saved and are applied by TorchBackend after loading instead.
+
+Serve the result with DL_MODEL_FORMAT=torchscript DL_MODEL_PATH=<output>
+
+Usage (from app/dl):
+    python -m tools.export_torchscript [--precision float32]
+"""
+import argparse
+import os
+import sys
+import time
+
+import torch
+
+from app import config
+from app.backends import PRECISIONS, save_torchscript
+from app.resnet import ResNet
+
+
+def script_model(model, example):
+    """Traced and frozen copy of an eval-mode `model`, ready for save_torchscript"""
+    with torch.no_grad():
+        module = torch.jit.trace(model, example)
+    return torch.jit.freeze(module, optimize_numerics=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=config.MODEL_PATH, help='float state dict to export')
+    parser.add_argument('--precision', default='float32', choices=list(PRECISIONS))
+    parser.add_argument('--output', default=None,
+                        help='defaults to app/ResNet/plant-disease-model-<precision>.pt')
+    args = parser.parse_args()
+    output = args.output or os.path.join('app', 'ResNet', f'plant-disease-model-{args.precision}.pt')
+
+    start = time.perf_counter()
+    eager = ResNet(precision=args.precision, model_path=args.model, model_format='state_dict',
+                   backend='torch', cascade_head_path=None)
+    eager_load = time.perf_counter() - start
+
+    example = torch.rand(1, 3, 256, 256).to(eager.dtype)
+    module = script_model(eager.model, example)
+    save_torchscript(module, output, {'format': 'torchscript', 'precision': eager.precision,
+                                      'source': os.path.basename(args.model)})
+    print(f"Wrote {output}")
+
+    start = time.perf_counter()
+    scripted = ResNet(model_path=output, model_format='torchscript', backend='torch', cascade_head_path=None)
+    scripted_load = time.perf_counter() - start
+
+    xb = torch.rand(4, 3, 256, 256)
+    max_diff = (scripted.predict_logits(xb) - eager.predict_logits(xb)).abs().max().item()
+    print(f"Load time       eager {eager_load:.2f}s  torchscript {scripted_load:.2f}s")
+    print(f"Max |logit diff| {max_diff:.6f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""
+Ground-truth labels for folders of leaf images
+An image is labelled by its folder when the folder is named after a model
+class (ImageFolder layout), otherwise by its file name: the words of
+"AppleScab1.JPG" or "apple_scab_1.jpg" are matched to the class label
+containing all of them with the fewest others (Apple___Apple_scab). Images
+matching no class, or several equally well, are left unlabelled.
+"""
+import os
+import re
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+
+
+def name_words(text):
+    """Lowercase words of a file name or class label, split at case changes and punctuation, digits dropped"""
+    return [word.lower() for word in re.findall(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+', text)]
+
+
+def label_from_filename(filename, classes):
+    """Index in `classes` of the class the file name describes, None when there is no single best match"""
+    words = set(name_words(os.path.splitext(os.path.basename(filename))[0]))
+    if not words:
+        return None
+    best, best_extra = [], None
+    for index, label in enumerate(classes):
+        label_words = name_words(label)
+        if not words <= set(label_words):
+            continue
+        extra = len(set(label_words) - words)
+        if best_extra is None or extra < best_extra:
+            best, best_extra = [index], extra
+        elif extra == best_extra:
+            best.append(index)
+    return best[0] if len(best) == 1 else None
+
+
+def labelled_images(root, classes, extensions=IMAGE_EXTENSIONS):
+    """(paths, targets) of every image under `root`, targets being class indices or None"""
+    paths, targets = [], []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        folder = os.path.basename(dirpath)
+        for filename in sorted(filenames):
+            if not filename.lower().endswith(extensions):
+                continue
+            paths.append(os.path.join(dirpath, filename))
+            targets.append(classes.index(folder) if folder in classes else label_from_filename(filename, classes))
+    return paths, targets
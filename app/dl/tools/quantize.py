@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+INT8 post-training quantization pipeline for ResNet9
+Fuses the ConvBlock Conv/BatchNorm/ReLU triples, calibrates on a sample of a
+folder of images, writes a quantized TorchScript artifact and reports its accuracy
+against the float model (images are labelled by folder or file name, see tools/labels.py)
+
+Serve the result with DL_MODEL_FORMAT=int8 DL_MODEL_PATH=<output>
+
+Usage (from app/dl):
+    python -m tools.quantize [--data app/test] [--calibration-size 64]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import torch
+
+from app import config
+from app.resnet import ResNet
+from app.quantization import quantize_resnet9, save_int8
+from tools.labels import labelled_images
+
+
+def batches(resnet, paths, batch_size):
+    for i in range(0, len(paths), batch_size):
+        yield torch.stack([resnet.preprocess(path) for path in paths[i:i + batch_size]])
+
+
+def evaluate(resnet, paths, batch_size):
+    preds = []
+    start = time.perf_counter()
+    for xb in batches(resnet, paths, batch_size):
+        preds.extend(torch.argmax(resnet.predict_logits(xb), dim=1).tolist())
+    return preds, time.perf_counter() - start
+
+
+def accuracy(preds, targets):
+    scored = [(p, t) for p, t in zip(preds, targets) if t is not None]
+    if not scored:
+        return None
+    return sum(p == t for p, t in scored) / len(scored)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=config.MODEL_PATH, help='float state dict to quantize')
+    parser.add_argument('--data', default='app/test', help='images used for calibration and evaluation')
+    parser.add_argument('--output', default=os.path.join('app', 'ResNet', 'plant-disease-model-int8.pt'))
+    parser.add_argument('--calibration-size', type=int, default=64)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    float_resnet = ResNet(precision='float32', model_path=args.model, model_format='state_dict',
+                          backend='torch', cascade_head_path=None)
+
+    paths, targets = labelled_images(args.data, float_resnet.classes)
+    if not paths:
+        print(f"No images found under {args.data}")
+        return 1
+
+    calibration = random.Random(args.seed).sample(paths, min(args.calibration_size, len(paths)))
+    print(f"Calibrating on {len(calibration)} of {len(paths)} images from {args.data}")
+    model = quantize_resnet9(float_resnet.model.state_dict(), batches(float_resnet, calibration, args.batch_size),
+                             num_diseases=len(float_resnet.classes), widths=float_resnet.model.widths)
+    save_int8(model, args.output, metadata={'source': os.path.basename(args.model),
+                                            'calibration_images': len(calibration)})
+    print(f"Wrote {args.output}")
+
+    int8_resnet = ResNet(model_path=args.output, model_format='int8', backend='torch', cascade_head_path=None)
+    float_preds, float_time = evaluate(float_resnet, paths, args.batch_size)
+    int8_preds, int8_time = evaluate(int8_resnet, paths, args.batch_size)
+
+    agreement = sum(a == b for a, b in zip(float_preds, int8_preds)) / len(paths)
+    float_acc, int8_acc = accuracy(float_preds, targets), accuracy(int8_preds, targets)
+    print(f"Model size      float {os.path.getsize(args.model) / 1e6:.1f}MB  int8 {os.path.getsize(args.output) / 1e6:.1f}MB")
+    print(f"Time            float {float_time:.2f}s  int8 {int8_time:.2f}s ({float_time / int8_time:.2f}x)")
+    print(f"Top-1 agreement {agreement:.4f}")
+    if float_acc is None:
+        print("Accuracy        n/a (no folder or file name matches a model class)")
+    else:
+        labelled = sum(target is not None for target in targets)
+        print(f"Accuracy        float {float_acc:.4f}  int8 {int8_acc:.4f}  delta {int8_acc - float_acc:+.4f} "
+              f"({labelled} labelled images)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Rebuild the analytics rollups from detectionHistory
+Needed after enabling DL_ANALYTICS_ROLLUPS on an existing database, or when
+/api/dl/stats reports failed history callbacks. Buckets in the range are
+deleted and recounted with one aggregation per granularity, so run it for
+closed periods or accept that detections written meanwhile may be missed.
+
+Usage (from app/dl, MONGO_URI as for the service):
+    python -m tools.rebuild_rollups [--from 2026-10-01] [--to 2026-10-18]
+"""
+import argparse
+import sys
+
+from pymongo import MongoClient
+
+from app import config
+from app.analytics import GROUP_FIELDS, ROLLUPS
+
+
+def rebuild(db, collection, prefix_length, start, end):
+    match = {'createdAt': {'$type': 'string'}}
+    bucket_range = {}
+    if start:
+        match['createdAt']['$gte'] = start[:prefix_length]
+        bucket_range['$gte'] = start[:prefix_length]
+    if end:
+        # Every createdAt in the last bucket sorts below the bucket prefix followed by "~"
+        match['createdAt']['$lt'] = end[:prefix_length] + '~'
+        bucket_range['$lte'] = end[:prefix_length]
+    db[collection].delete_many({'bucket': bucket_range} if bucket_range else {})
+
+    class_field = {'$ifNull': ['$detected_class', 'unknown']}
+    key = {
+        'bucket': {'$substrCP': ['$createdAt', 0, prefix_length]},
+        'detected_class': class_field,
+        'plant': {'$arrayElemAt': [{'$split': [class_field, '___']}, 0]},
+        'state': {'$ifNull': ['$state', 'unknown']},
+        'district': {'$ifNull': ['$district', 'unknown']},
+    }
+    id_parts = []
+    for field in GROUP_FIELDS:
+        id_parts += ['|', f'$_id.{field}'] if id_parts else [f'$_id.{field}']
+    db.detectionHistory.aggregate([
+        {'$match': match},
+        {'$group': {'_id': key, 'count': {'$sum': 1}}},
+        # Same _id as app.analytics.rollup_updates: the group fields joined by "|"
+        {'$project': {'_id': {'$concat': id_parts}, 'count': 1,
+                      **{field: f'$_id.{field}' for field in GROUP_FIELDS}}},
+        {'$merge': {'into': collection, 'on': '_id', 'whenMatched': 'replace', 'whenNotMatched': 'insert'}},
+    ], allowDiskUse=True)
+    return db[collection].count_documents({'bucket': bucket_range} if bucket_range else {})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--from', dest='start', help='first day ("2026-10-01") to rebuild')
+    parser.add_argument('--to', dest='end', help='last day to rebuild, inclusive')
+    args = parser.parse_args()
+
+    db = MongoClient(config.MONGO_URI).get_default_database()
+    for granularity, (collection, prefix_length) in ROLLUPS.items():
+        count = rebuild(db, collection, prefix_length, args.start, args.end)
+        print(f"{granularity}: {count} rollup documents in {collection}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Train the early-exit head used by the cascade (DL_CASCADE_HEAD_PATH)
+The ResNet9 trunk stays frozen. The head is distilled from the full model's
+softmax output, so any folder of leaf images works; images labelled by folder
+or file name (see tools/labels.py) mix the true labels in with --label-weight.
+
+Usage (from app/dl):
+    python -m tools.train_early_exit --data TRAIN_IMAGES [--epochs 20]
+"""
+import argparse
+import os
+import sys
+
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+
+from app.resnet import ResNet
+from app.resnet9 import EarlyExitHead
+from tools.bulk_score import ImagePathDataset
+from tools.labels import labelled_images
+
+
+def extract(resnet, paths, batch_size, workers):
+    """Pooled stage 1 features and full-model probabilities for every decodable image"""
+    loader = DataLoader(ImagePathDataset(paths, torch.float32), batch_size=batch_size, num_workers=workers)
+    kept, features, teacher = [], [], []
+    model = resnet.model
+    with torch.no_grad():
+        for xb, batch_paths, errors, _ in loader:
+            keep = torch.tensor([not error for error in errors])
+            for path, error in zip(batch_paths, errors):
+                if error:
+                    print(f"Skipping {path}: {error}")
+                else:
+                    kept.append(path)
+            stage1 = model.forward_stage1(xb[keep])
+            features.append(stage1.mean(dim=(2, 3)))
+            teacher.append(torch.softmax(model.forward_stage2(stage1), dim=1))
+    return kept, torch.cat(features), torch.cat(teacher)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='app/test', help='folder of training images')
+    parser.add_argument('--output', default=os.path.join('app', 'ResNet', 'early-exit-head.pth'))
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--lr', type=float, default=1e-2)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--label-weight', type=float, default=0.5,
+                        help='weight of the true-label loss on labelled images')
+    args = parser.parse_args()
+
+    resnet = ResNet(precision='float32', model_format='state_dict', backend='torch', cascade_head_path=None)
+    paths, targets = labelled_images(args.data, resnet.classes)
+    labels_by_path = {path: -1 if target is None else target for path, target in zip(paths, targets)}
+    print(f"Extracting features for {len(paths)} images from {args.data}, "
+          f"{sum(t is not None for t in targets)} labelled")
+    kept, features, teacher = extract(resnet, paths, args.batch_size, args.workers)
+    labels = torch.tensor([labels_by_path[path] for path in kept])
+    labelled = labels >= 0
+
+    head = EarlyExitHead(features.shape[1], len(resnet.classes))
+    linear = head.classifier[-1]
+    optimizer = torch.optim.Adam(linear.parameters(), lr=args.lr)
+    for epoch in range(args.epochs):
+        permutation = torch.randperm(len(features))
+        total_loss = 0.0
+        for i in range(0, len(features), args.batch_size):
+            idx = permutation[i:i + args.batch_size]
+            log_probs = F.log_softmax(linear(features[idx]), dim=1)
+            loss = -(teacher[idx] * log_probs).sum(dim=1).mean()
+            if labelled[idx].any():
+                label_loss = F.nll_loss(log_probs[labelled[idx]], labels[idx][labelled[idx]])
+                loss = (1 - args.label_weight) * loss + args.label_weight * label_loss
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * len(idx)
+        with torch.no_grad():
+            agreement = (linear(features).argmax(dim=1) == teacher.argmax(dim=1)).float().mean().item()
+        print(f"Epoch [{epoch}], loss: {total_loss / len(features):.4f}, agreement with full model: {agreement:.4f}")
+
+    torch.save(head.state_dict(), args.output)
+    print(f"Wrote {args.output}, evaluate it with python -m tools.cascade_report --head {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
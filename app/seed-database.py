@@ -5,6 +5,7 @@ Populates MongoDB with plant and disease data from CSV files
 """
 
 import csv
+from datetime import datetime
 from pymongo import MongoClient
 
 # Connect to MongoDB
@@ -161,6 +162,11 @@ disease_data = [
 result = db.disease.insert_many(disease_data)
 print(f"Inserted {len(result.inserted_ids)} diseases")
 
+# Bump the catalog version so running detection services reload their cached copy
+db.catalogMeta.update_one({"_id": "catalog"},
+                          {"$inc": {"version": 1}, "$set": {"updatedAt": datetime.now()}},
+                          upsert=True)
+
 # Verify data
 print("\n=== Database Summary ===")
 print(f"Total plants: {db.plants.count_documents({})}")